@@ -1,24 +1,128 @@
 import os
 import sys
 import json
+import re
+import hashlib
+import threading
+import time
 from datetime import datetime
-import PyPDF2
-from io import BytesIO
 
 # 👇 This tells Python to look inside 'src/'
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from oracle_epm_support.crew import build_crew
-from flask import Flask, request, render_template_string, send_from_directory
+from oracle_epm_support.model_tiers import TierPolicy
+from oracle_epm_support.crew_jobs import CrewJobQueue, JobQueueFull
+from oracle_epm_support.rag_system import SimpleRAGSystem, route_problem
+from oracle_epm_support.cache import TTLCache
+from oracle_epm_support.search_index import BM25Index
+from oracle_epm_support.pdf_extraction import ExtractionCache, extract_text_from_pdf, spool_upload
+from oracle_epm_support.upload_jobs import UploadJobQueue, UploadQueueFull
+from oracle_epm_support.response_cache import article_key, make_response_cache, normalize_problem
+from oracle_epm_support import telemetry
+from oracle_epm_support.context_packer import article_snippets, count_tokens, pack_snippets, pdf_snippets
+from flask import Flask, Response, g, redirect, request, render_template_string, send_from_directory, stream_with_context
 import os
 import sys
-from rag_knowledge_manager import RAGKnowledgeManager
+from rag_knowledge_manager import RAGKnowledgeManager, SHARED_MODULES
 
 # Configure CrewAI to use Anthropic
 os.environ["ANTHROPIC_API_KEY"] = os.getenv("ANTHROPIC_API_KEY", "")
 
+# Number of specialist agents a question is routed to (1 = single best match)
+ROUTE_TOP_K = int(os.getenv("ROUTE_TOP_K", "1"))
+# Run multi-module questions as parallel single-agent crews ("parallel") or one sequential crew
+CREW_EXECUTION_MODE = os.getenv("CREW_EXECUTION_MODE", "parallel")
+# Per-agent deadline in fan-out mode; kept below the 300s request timeout
+AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", "240"))
+# Max crews running at once, and how long a request waits for a free slot
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "4"))
+CREW_POOL_WAIT = float(os.getenv("CREW_POOL_WAIT", "30"))
+# Background crew jobs: concurrent runs, queued jobs before 429s, and the deadline after which
+# a job stops making LLM calls
+CREW_JOB_WORKERS = int(os.getenv("CREW_JOB_WORKERS", str(CREW_POOL_SIZE)))
+CREW_JOB_MAX_PENDING = int(os.getenv("CREW_JOB_MAX_PENDING", "20"))
+CREW_JOB_TIMEOUT = float(os.getenv("CREW_JOB_TIMEOUT", "300"))
+# Identical questions asked while one is being answered share that run instead of starting their own
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+# Per-(query, module) retrieval cache
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+# Knowledge base search backend: "bm25" (keyword) or "vector" (local embeddings)
+KB_SEARCH_BACKEND = os.getenv("KB_SEARCH_BACKEND", "bm25")
+# Optional local sentence-transformers model; hashed TF-IDF vectors are used without it
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+VECTOR_MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", "0.05"))
+# Uploaded documents are split into chunks of about this many characters, with overlap
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Model cascade: known error codes are answered from the KB, other questions by the fast model,
+# escalating to the large one on low retrieval confidence, long scripts or user request
+MODEL_TIERING = os.getenv("MODEL_TIERING", "true").lower() in ("1", "true", "yes")
+KB_ANSWER_MAX_WORDS = int(os.getenv("KB_ANSWER_MAX_WORDS", "25"))
+ESCALATE_SCRIPT_CHARS = int(os.getenv("ESCALATE_SCRIPT_CHARS", "1500"))
+ESCALATE_MIN_ARTICLES = int(os.getenv("ESCALATE_MIN_ARTICLES", "1"))
+ESCALATE_MIN_SCORE = float(os.getenv("ESCALATE_MIN_SCORE", "0"))
+# Approximate tokens of question, KB articles and PDF excerpts each agent's prompt may carry
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+# Worker processes parsing uploaded PDFs, and max files waiting before uploads get a 429
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_MAX_PENDING = int(os.getenv("UPLOAD_MAX_PENDING", "50"))
+# Per-PDF limits that bound memory and work per upload
+MAX_PDF_MB = int(os.getenv("MAX_PDF_MB", "50"))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "1000"))
+# Extracted PDF text is cached on disk by file hash so identical files are parsed once
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pdf_text")
+)
+EXTRACTION_CACHE_MB = int(os.getenv("EXTRACTION_CACHE_MB", "500"))
+# Final-answer cache in front of the crews: "memory", "sqlite", "postgres" or "off"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite3")
+)
+# Optional file that per-stage OpenTelemetry spans are appended to (JSON, one span per line)
+OTEL_TRACES_FILE = os.getenv("OTEL_TRACES_FILE")
+# Connect the database and load CrewAI in a background thread at startup instead of on the first request
+WARM_UP = os.getenv("WARM_UP", "true").lower() in ("1", "true", "yes")
+PORT = int(os.getenv("PORT", "3000"))
+
+if OTEL_TRACES_FILE:
+    try:
+        telemetry.configure_tracing(OTEL_TRACES_FILE)
+        print(f"📈 Writing OpenTelemetry spans to {OTEL_TRACES_FILE}")
+    except ImportError as e:
+        print(f"⚠️ {e}")
+
 app = Flask(__name__)
 
+# Every request is one "request" stage; the stages it goes through nest under it
+@app.before_request
+def start_request_span():
+    if request.endpoint not in (None, 'metrics', 'static_files'):
+        g.request_span = telemetry.span("request", detail=request.endpoint)
+        g.request_span.__enter__()
+
+# The database and crews are set up on the first request that needs them, unless warm-up already did
+@app.before_request
+def ensure_services():
+    if request.endpoint not in (None, 'metrics', 'static_files'):
+        init_services()
+
+@app.teardown_request
+def end_request_span(error=None):
+    request_span = g.pop('request_span', None)
+    if request_span is not None:
+        request_span.__exit__(type(error) if error else None, error, None)
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms, token and cache counters and database pool gauges in the Prometheus text format"""
+    if db_rag_manager:
+        telemetry.record_pool(db_rag_manager.pool_stats())
+    return Response(telemetry.render_metrics(), mimetype="text/plain; version=0.0.4")
+
 # Static file serving
 @app.route('/static/<filename>')
 def static_files(filename):
@@ -116,83 +220,94 @@ KNOWLEDGE_BASE = {
     ]
 }
 
-def search_knowledge_base(query, max_results=3):
-    """Search the knowledge base for relevant documents based on query keywords"""
-    query_lower = query.lower()
-    results = []
-
-    # Search through all categories
-    for category, documents in KNOWLEDGE_BASE.items():
-        for doc in documents:
-            score = 0
-            # Check title match
-            if any(word in doc['title'].lower() for word in query_lower.split()):
-                score += 3
-
-            # Check keyword match
-            for keyword in doc['keywords']:
-                if keyword in query_lower:
-                    score += 2
-
-            # Check content match
-            if any(word in doc['content'].lower() for word in query_lower.split() if len(word) > 3):
-                score += 1
-
-            if score > 0:
-                results.append({
-                    'doc': doc,
-                    'score': score,
-                    'category': category
-                })
-
-    # Sort by relevance score and return top results
-    results.sort(key=lambda x: x['score'], reverse=True)
-    return results[:max_results]
-
-def extract_text_from_pdf(pdf_file):
-    """Extract text content from uploaded PDF file with detailed validation"""
-    try:
-        # Read PDF content
-        pdf_content = pdf_file.read()
-        if len(pdf_content) == 0:
-            raise ValueError("PDF file is empty")
-
-        pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_content))
-
-        # Check if PDF is encrypted
-        if pdf_reader.is_encrypted:
-            raise ValueError("PDF is password protected and cannot be read")
-
-        # Check number of pages
-        num_pages = len(pdf_reader.pages)
-        if num_pages == 0:
-            raise ValueError("PDF contains no pages")
-
-        text_content = ""
-        pages_with_text = 0
-
-        for page_num in range(num_pages):
-            try:
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                if page_text.strip():
-                    text_content += f"[Page {page_num + 1}]\n{page_text}\n\n"
-                    pages_with_text += 1
-            except Exception as page_error:
-                print(f"Warning: Could not extract text from page {page_num + 1}: {page_error}")
-                continue
-
-        if pages_with_text == 0:
-            raise ValueError(f"No readable text found in any of the {num_pages} pages. PDF may contain only images or scanned content.")
-
-        return text_content.strip()
-
-    except Exception as e:
-        raise Exception(f"PDF processing failed: {str(e)}")
+def create_kb_index(backend):
+    """In-process search index for the configured backend, BM25 if vectors are unavailable"""
+    if backend == "vector":
+        try:
+            from oracle_epm_support.vector_index import VectorIndex, make_embedder
+            return VectorIndex(make_embedder(EMBEDDING_MODEL), min_score=VECTOR_MIN_SCORE)
+        except ImportError as e:
+            print(f"⚠️ Vector search unavailable ({e}), falling back to BM25")
+    return BM25Index()
+
+# In-process index over KNOWLEDGE_BASE (BM25 inverted index or vectors), built by init_services()
+kb_index = None
+
+def add_to_knowledge_base(doc, category):
+    """Add a document to the in-memory knowledge base and index it incrementally"""
+    documents = KNOWLEDGE_BASE.setdefault(category, [])
+    documents[:] = [d for d in documents if d['id'] != doc['id']] + [doc]
+    kb_index.add(doc['id'], doc, category=category)
+
+def search_knowledge_base(query, max_results=3, module=None):
+    """Search the in-process index for relevant documents (BM25 or vector similarity)"""
+    allowed = [module] + SHARED_MODULES if module else None
+    hits = kb_index.search(
+        query,
+        k=max_results,
+        predicate=lambda entry: allowed is None or entry['doc']['module'].lower() in allowed
+    )
+    return [
+        {'doc': entry['doc'], 'score': round(score, 3), 'category': entry['category']}
+        for score, _doc_id, entry in hits
+    ]
 
-def format_rag_context(search_results):
-    """Format search results into context for the AI agents"""
-    if not search_results:
+# SHA-256 of files already ingested in memory mode (the database tracks its own)
+uploaded_hashes = {}
+
+def is_duplicate_upload(content_hash):
+    """Whether a file with this content has already been ingested"""
+    if db_rag_manager:
+        return db_rag_manager.find_document_by_hash(content_hash) is not None
+    return content_hash in uploaded_hashes
+
+def store_document(title, chunks, page_count, content_hash=None):
+    """Store a parsed document's chunks as searchable articles (runs on the upload storer thread).
+
+    Returns the ids of the articles stored; chunks already in the database are skipped.
+    """
+    if db_rag_manager:
+        _document_id, article_ids = db_rag_manager.add_document(
+            title, chunks, page_count=page_count, file_hash=content_hash
+        )
+        if KB_SEARCH_BACKEND == "vector":
+            kb_index.add_many(
+                (article['article_id'], article, {'category': article['category']})
+                for article in db_rag_manager.get_articles(article_ids)
+            )
+    else:
+        # Re-uploading a file replaces all of its previous chunks
+        chunk_id_re = re.compile(rf"^upload_{re.escape(title)}_c\d+$")
+        uploaded = KNOWLEDGE_BASE.setdefault("uploaded_docs", [])
+        for doc in [d for d in uploaded if chunk_id_re.match(d['id'])]:
+            uploaded.remove(doc)
+            kb_index.remove(doc['id'])
+        article_ids = [f"upload_{title}_c{chunk['index']:04d}" for chunk in chunks]
+        for article_id, chunk in zip(article_ids, chunks):
+            add_to_knowledge_base({
+                "id": article_id,
+                "title": f"{title} (p. {chunk['page_start']}-{chunk['page_end']})",
+                "content": chunk['text'],
+                "keywords": chunk['keywords'],
+                "module": "Uploaded"
+            }, "uploaded_docs")
+        if content_hash:
+            uploaded_hashes[content_hash] = title
+
+    # New articles change search results
+    retrieval_cache.clear()
+    return article_ids
+
+def sync_kb_index(article_ids):
+    """Re-index updated database articles in the vector index and drop deleted ones"""
+    articles = db_rag_manager.get_articles(article_ids)
+    kb_index.add_many((article['article_id'], article, {'category': article['category']}) for article in articles)
+    for article_id in set(article_ids) - {article['article_id'] for article in articles}:
+        kb_index.remove(article_id)
+
+def format_rag_context(search_results, hints=None):
+    """Format search results and curated module hints into one context block for the AI agents"""
+    if not search_results and not hints:
         return ""
 
     context = "\n=== RELEVANT KNOWLEDGE BASE ARTICLES ===\n"
@@ -203,33 +318,373 @@ def format_rag_context(search_results):
         context += f"   Content: {doc['content']}\n"
         context += f"   Relevance Score: {result['score']}\n"
 
+    if hints:
+        context += "\nKEY CHECKS:\n"
+        context += "\n".join(f"- {hint}" for hint in hints) + "\n"
+
     context += "\n=== END KNOWLEDGE BASE ===\n"
     context += "Please reference these articles when relevant to the user's question.\n\n"
     return context
 
-# Initialize PostgreSQL RAG manager
-try:
-    db_rag_manager = RAGKnowledgeManager()
-
-    # Import existing knowledge base if database is empty
-    existing_articles = db_rag_manager.get_all_articles()
-    if not existing_articles:
-        print("📚 Importing existing knowledge base to PostgreSQL...")
-        db_rag_manager.import_from_knowledge_base(KNOWLEDGE_BASE)
-
-    print(f"✅ PostgreSQL RAG system initialized with {len(db_rag_manager.get_all_articles())} articles")
-except Exception as e:
-    print(f"❌ Failed to initialize PostgreSQL RAG: {e}")
-    db_rag_manager = None
-
-# Initialize crew with error handling
-try:
-    crew = build_crew()
-    print("✅ Crew initialized successfully")
-    print("📚 RAG Knowledge Base loaded with", sum(len(docs) for docs in KNOWLEDGE_BASE.values()), "articles")
-except Exception as e:
-    print(f"❌ Failed to initialize crew: {e}")
-    crew = None
+def format_pdf_excerpts(chunks):
+    """Format the packed chunks of the user's PDF, in page order, as a context block"""
+    if not chunks:
+        return ""
+
+    context = "\n=== UPLOADED PDF EXCERPTS (most relevant sections) ===\n"
+    for chunk in sorted(chunks, key=lambda c: c['index']):
+        pages = f"p. {chunk['page_start']}" if chunk['page_start'] == chunk['page_end'] else f"pp. {chunk['page_start']}-{chunk['page_end']}"
+        context += f"\n[{pages}]\n{chunk['text']}\n"
+    context += "\n=== END PDF EXCERPTS ===\n\n"
+    return context
+
+def pack_context(problem, search_results, hints, pdf_chunks):
+    """Fill one agent's token budget with its most relevant KB articles and PDF excerpts.
+
+    The question and curated hints always go in; articles and PDF chunks are
+    ranked, deduplicated and added until the budget is used up. Returns the
+    context block and the packing stats.
+    """
+    reserved = count_tokens(problem) + count_tokens("\n".join(hints or []))
+    packed, stats = pack_snippets(article_snippets(search_results) + pdf_chunks, max(0, CONTEXT_TOKEN_BUDGET - reserved))
+    stats["budget"] = CONTEXT_TOKEN_BUDGET
+    stats["tokens"] += reserved
+    articles = [s['item'] for s in packed if s['kind'] == "article"]
+    excerpts = [s['item'] for s in packed if s['kind'] == "pdf"]
+    return format_rag_context(articles, hints) + format_pdf_excerpts(excerpts), stats
+
+# PostgreSQL RAG manager and final-answer cache, set up by init_services()
+db_rag_manager = None
+response_cache = None
+
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MB * 1024 * 1024)
+
+# Background PDF ingestion: parsing in worker processes, storing on this process's storer thread
+upload_jobs = UploadJobQueue(
+    store_document,
+    workers=UPLOAD_WORKERS,
+    chunk_size=CHUNK_SIZE,
+    overlap=CHUNK_OVERLAP,
+    max_pending=UPLOAD_MAX_PENDING,
+    max_pages=MAX_PDF_PAGES,
+    cache=extraction_cache
+)
+
+# Curated per-module hints and keyword router
+curated_rag = SimpleRAGSystem()
+tier_policy = TierPolicy(
+    enabled=MODEL_TIERING,
+    kb_max_words=KB_ANSWER_MAX_WORDS,
+    script_chars=ESCALATE_SCRIPT_CHARS,
+    min_articles=ESCALATE_MIN_ARTICLES,
+    min_score=ESCALATE_MIN_SCORE
+)
+retrieval_cache = TTLCache(maxsize=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL)
+
+def retrieve_context(query, module):
+    """Single per-request retrieval stage, cached per (query, module).
+
+    Returns the matching KB articles and the curated hints for the module.
+    """
+    key = (query, module)
+    with telemetry.span("retrieval", detail="cached") as timing:
+        cached = retrieval_cache.get(key)
+        telemetry.record_cache("retrieval", cached is not None)
+        if cached is not None:
+            return cached
+
+        # Use PostgreSQL full-text search if available, otherwise the in-process index
+        if db_rag_manager and KB_SEARCH_BACKEND != "vector":
+            timing.detail = "db"
+            db_results = db_rag_manager.search_articles(query, module=module)
+            rag_results = [{'doc': r['article'], 'score': r['score'], 'category': r['article']['category']} for r in db_results]
+        else:
+            # Vector search by choice, or the in-process index because the database is unavailable
+            timing.detail = KB_SEARCH_BACKEND if db_rag_manager else "fallback"
+            rag_results = search_knowledge_base(query, module=module)
+
+        hints = curated_rag.retrieve_relevant_context(query, module)
+        retrieved = (rag_results, hints)
+        timing.set(results=len(rag_results))
+    retrieval_cache.set(key, retrieved)
+    return retrieved
+
+def prepare_request(problem, pdf_text="", escalate=False):
+    """Route a problem, retrieve its context and pick the model tier; fast, so it runs in the web request.
+
+    `escalate` asks for the large model. Returns the crew job payload plus the
+    deduplicated KB results for display.
+    """
+    # Route to the relevant specialist(s) instead of running all six tasks
+    with telemetry.span("routing"):
+        modules = route_problem(problem, top_k=ROUTE_TOP_K, rag_system=curated_rag)
+    print(f"🧭 Routed to modules: {modules}")
+
+    # Retrieve once per routed module; each task only gets its own module's block
+    search_query = f"{problem} {pdf_text[:200]}" if pdf_text else problem
+    retrieved = {}
+    rag_results = []
+    seen_ids = set()
+    for module in modules:
+        retrieved[module] = retrieve_context(search_query, module)
+        for r in retrieved[module][0]:
+            if r['doc']['id'] not in seen_ids:
+                seen_ids.add(r['doc']['id'])
+                rag_results.append(r)
+
+    print(f"🔍 RAG Search found {len(rag_results)} relevant articles")
+
+    # route_problem only returns more than ROUTE_TOP_K modules when no module keyword matched
+    error_codes = curated_rag.lookup_error_codes(problem)
+    tier, tier_reason = tier_policy.choose(
+        problem, pdf_text,
+        module_results={module: results for module, (results, _hints) in retrieved.items()},
+        routed_all=len(modules) > ROUTE_TOP_K,
+        error_codes=error_codes,
+        escalate=escalate
+    )
+    telemetry.TIER_REQUESTS.inc(tier=tier, reason=tier_reason)
+    print(f"🎚️ Model tier: {tier} ({tier_reason})")
+
+    # Context lives in the routed tasks, packed to each agent's token budget; the problem input
+    # carries only the question
+    with telemetry.span("prompt_assembly") as timing:
+        pdf_chunks = pdf_snippets(problem, pdf_text, CHUNK_SIZE, CHUNK_OVERLAP) if pdf_text else []
+        contexts, packing = {}, {}
+        for module in modules:
+            contexts[module], packing[module] = pack_context(problem, *retrieved[module], pdf_chunks)
+            stats = packing[module]
+            print(f"📦 {module} context: {stats['tokens']}/{stats['budget']} tokens, {stats['packed']} snippets packed, "
+                  f"{stats['dropped']} dropped ({stats['dropped_tokens']} tokens), {stats['duplicates']} duplicates")
+            telemetry.CONTEXT_TOKENS.inc(stats['tokens'], result="packed")
+            telemetry.CONTEXT_TOKENS.inc(stats['dropped_tokens'], result="dropped")
+
+        enhanced_problem = f"USER PROBLEM: {problem}"
+        if pdf_text:
+            enhanced_problem += "\n\nThe user uploaded a PDF; its most relevant sections are in your task context."
+
+        payload = {
+            "problem": problem,
+            "pdf_text": pdf_text,
+            "enhanced_problem": enhanced_problem,
+            "modules": modules,
+            "contexts": contexts,
+            "articles": [r['doc'] for r in rag_results],
+            "rag_results": [{'doc': r['doc'], 'score': r['score']} for r in rag_results],
+            "packing": packing,
+            "tier": tier,
+            "tier_reason": tier_reason,
+            "error_codes": error_codes,
+        }
+        timing.set(
+            context_tokens=sum(p['tokens'] for p in packing.values()),
+            dropped_tokens=sum(p['dropped_tokens'] for p in packing.values()),
+            dropped_snippets=sum(p['dropped'] for p in packing.values()),
+        )
+    return payload, rag_results
+
+def flight_key(payload):
+    """Key under which identical in-flight questions share one crew run (None disables coalescing)"""
+    if not COALESCE_REQUESTS:
+        return None
+    key = json.dumps({
+        "problem": normalize_problem(payload['problem']),
+        "pdf": hashlib.sha256(payload['pdf_text'].encode("utf-8")).hexdigest() if payload['pdf_text'] else "",
+        "modules": sorted(payload['modules']),
+        "articles": sorted(doc['id'] for doc in payload['articles']),
+        "tier": payload['tier'],
+    })
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def route_step(payload):
+    """Progress event describing where a request was routed"""
+    return {
+        "type": "step", "agent": "Router",
+        "text": f"🧭 Routed to {', '.join(payload['modules'])} with {len(payload['articles'])} knowledge base articles "
+                f"({payload['tier']} tier: {payload['tier_reason'].replace('_', ' ')})"
+    }
+
+def answer_without_crew(payload, emit):
+    """Answer from the knowledge base or the response cache, in the request thread; None if a crew run is needed"""
+    if payload['tier'] == "kb":
+        with telemetry.span("answer", detail="kb"):
+            result = answer_from_kb(payload)
+        emit({"type": "step", "agent": "Knowledge Base", "text": "📚 Answered from the curated knowledge base"})
+        return result
+
+    # Repeated questions over unchanged articles are answered from the cache; each tier has its own answers
+    if not response_cache:
+        return None
+    payload['cache_key'] = response_cache.key(
+        payload['problem'], payload['modules'], payload['articles'], extra=f"{payload['tier']}\n{payload['pdf_text']}"
+    )
+    with telemetry.span("response_cache", detail=RESPONSE_CACHE_BACKEND):
+        try:
+            cached_result = response_cache.get(payload['cache_key'])
+        except Exception as e:
+            print(f"Warning: response cache lookup failed: {e}")
+            cached_result = None
+        telemetry.record_cache("response", cached_result is not None)
+    if cached_result is not None:
+        print(f"⚡ Response cache hit ({response_cache.hits} hits / {response_cache.misses} misses)")
+        emit({"type": "step", "agent": "Cache", "text": "⚡ Answered from the response cache"})
+    return cached_result
+
+def start_job(payload):
+    """Answer a prepared request: at once when no crew is needed, else queue a crew job. Returns the job ID.
+
+    Cache hits and knowledge base answers never wait behind crew runs or count
+    towards the job queue limit. Raises JobQueueFull when the queue is full.
+    """
+    events = [route_step(payload)]
+    result = answer_without_crew(payload, events.append)
+    if result is not None:
+        record_result(payload, result)
+        return crew_jobs.complete(result, events)
+    return crew_jobs.submit(payload, key=flight_key(payload))
+
+def run_crew_job(payload, cancel, emit):
+    """Answer a prepared request with a pooled crew (runs on a crew job thread).
+
+    Progress goes to `emit` as it happens, for the job's event stream.
+    """
+    emit(route_step(payload))
+
+    print(f"🤖 Starting AI agent processing on the {payload['tier']} model...")
+    with telemetry.span("answer", detail=payload['tier']):
+        result = str(crew_pool.kickoff(
+            payload['modules'],
+            inputs={"problem": payload['enhanced_problem']},
+            parallel=CREW_EXECUTION_MODE == "parallel",
+            timeout=AGENT_TIMEOUT,
+            contexts=payload['contexts'],
+            cancel=cancel,
+            on_event=emit,
+            tier=payload['tier']
+        ))
+    print("✅ AI processing completed successfully")
+    record_result(payload, result)
+
+    if payload.get('cache_key'):
+        try:
+            response_cache.set(payload['cache_key'], result, payload['articles'])
+        except Exception as e:
+            print(f"Warning: response cache store failed: {e}")
+    return result
+
+def answer_from_kb(payload):
+    """Answer a short question about known error codes from the curated knowledge base, without an LLM"""
+    lines = [f"**{code}**: {meaning}" for code, meaning in payload['error_codes'].items()]
+    if payload['rag_results']:
+        lines.append("\nRelated knowledge base articles:")
+        lines.extend(f"- {r['doc']['title']}: {r['doc']['content']}" for r in payload['rag_results'][:3])
+    lines.append("\nNeed more than the error meaning? Ask again with \"Deep analysis\" ticked for a full answer from the AI agents.")
+    return "\n".join(lines)
+
+def record_result(payload, result):
+    """Keep the latest answer for the /download links"""
+    download_results.last_result = {
+        'content': result,
+        'problem': payload['problem'],
+        'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S"),
+        'rag_results': payload['rag_results'],
+        'pdf_content': ''
+    }
+
+# Crew slots and the crew job queue, set up by init_services()
+crew_pool = None
+crew_jobs = None
+_services_lock = threading.Lock()
+_services_ready = False
+
+def init_services():
+    """Build the search index, connect the database and load the crews, once.
+
+    Importing the app does none of this, so the server is listening within a
+    second; the warm-up thread (or else the first request) pays for it. Later
+    calls return at once, concurrent ones wait for the first to finish.
+    """
+    global kb_index, db_rag_manager, response_cache, crew_pool, crew_jobs, _services_ready
+    if _services_ready:
+        return
+    with _services_lock:
+        if _services_ready:
+            return
+        started = time.perf_counter()
+
+        kb_index = create_kb_index(KB_SEARCH_BACKEND)
+        kb_index.add_many(
+            (doc['id'], doc, {'category': category})
+            for category, documents in KNOWLEDGE_BASE.items()
+            for doc in documents
+        )
+
+        # Initialize PostgreSQL RAG manager
+        try:
+            db_rag_manager = RAGKnowledgeManager()
+
+            # Import existing knowledge base if database is empty
+            if not db_rag_manager.has_articles():
+                print("📚 Importing existing knowledge base to PostgreSQL...")
+                db_rag_manager.import_from_knowledge_base(KNOWLEDGE_BASE)
+
+            if KB_SEARCH_BACKEND == "vector":
+                # Serve semantic search over the database articles from the in-process vector index
+                kb_index = create_kb_index(KB_SEARCH_BACKEND)
+                kb_index.add_many(
+                    (article['article_id'], article, {'category': article['category']})
+                    for article in db_rag_manager.get_all_articles()
+                )
+
+            print(f"✅ PostgreSQL RAG system initialized with {db_rag_manager.count_articles()} articles")
+        except Exception as e:
+            print(f"❌ Failed to initialize PostgreSQL RAG: {e}")
+            db_rag_manager = None
+
+        # Answers are keyed on question, modules and retrieved article versions
+        try:
+            response_cache = make_response_cache(
+                RESPONSE_CACHE_BACKEND,
+                ttl=RESPONSE_CACHE_TTL,
+                maxsize=RESPONSE_CACHE_SIZE,
+                path=RESPONSE_CACHE_PATH,
+                get_connection=db_rag_manager.get_connection if db_rag_manager else None
+            )
+        except Exception as e:
+            print(f"❌ Failed to initialize response cache: {e}")
+            response_cache = None
+        if db_rag_manager:
+            # Updated or deleted articles change search results, and the answers built from them
+            if KB_SEARCH_BACKEND == "vector":
+                db_rag_manager.add_listener(sync_kb_index)
+            db_rag_manager.add_listener(lambda _article_ids: retrieval_cache.clear())
+            if response_cache:
+                db_rag_manager.add_listener(response_cache.invalidate)
+
+        # Validate crew configuration; each request then gets its own crew from the pool.
+        # CrewAI and the Anthropic client are imported here, not at startup: they are most of the import time
+        try:
+            from oracle_epm_support.crew import build_crew
+            from oracle_epm_support.crew_pool import CrewPool
+
+            build_crew()
+            crew_pool = CrewPool(size=CREW_POOL_SIZE, wait_timeout=CREW_POOL_WAIT)
+            crew_jobs = CrewJobQueue(
+                run_crew_job,
+                workers=CREW_JOB_WORKERS,
+                max_pending=CREW_JOB_MAX_PENDING,
+                timeout=CREW_JOB_TIMEOUT
+            )
+            print(f"✅ Crew initialized successfully (pool size {CREW_POOL_SIZE})")
+            print("📚 RAG Knowledge Base loaded with", sum(len(docs) for docs in KNOWLEDGE_BASE.values()), "articles")
+        except Exception as e:
+            print(f"❌ Failed to initialize crew: {e}")
+            crew_pool = None
+            crew_jobs = None
+
+        _services_ready = True
+        telemetry.observe("init", time.perf_counter() - started)
+        print(f"🚀 Services ready in {time.perf_counter() - started:.2f}s")
 
 HTML = """
 <!doctype html>
@@ -238,6 +693,7 @@ HTML = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>CloseWise - Oracle EPM Support Assistant</title>
+    {% if pending %}<meta http-equiv="refresh" content="3">{% endif %}
     <style>
         * {
             margin: 0;
@@ -539,7 +995,135 @@ HTML = """
             return true;
         }
 
+        // Submit through the job API and render agent steps and tokens as they stream in;
+        // browsers without EventSource fall back to the plain form post
+        let currentJobId = null;
+
+        function submitProblem(event) {
+            if (!window.EventSource || !window.fetch) {
+                return showProgress();
+            }
+            event.preventDefault();
+
+            const form = document.getElementById('epm-form');
+            const submitBtn = document.getElementById('submit-btn');
+            const progressText = document.getElementById('progress-text');
+            const liveOutput = document.getElementById('live-output');
+
+            submitBtn.disabled = true;
+            submitBtn.value = 'Processing...';
+            document.getElementById('progress-container').style.display = 'block';
+            document.getElementById('stream-result').innerHTML = '';
+            progressText.textContent = 'Submitting your question...';
+            document.getElementById('progress-steps').textContent = '';
+            liveOutput.textContent = '';
+            liveOutput.style.display = 'block';
+
+            fetch('/jobs', { method: 'POST', body: new FormData(form) })
+                .then(response => response.json().then(data => ({ ok: response.ok, data })))
+                .then(({ ok, data }) => {
+                    if (!ok) throw new Error(data.error);
+                    streamJob(data.job_id);
+                })
+                .catch(error => finishStream(`❌ ${error.message}`));
+            return false;
+        }
+
+        function streamJob(jobId) {
+            const progressText = document.getElementById('progress-text');
+            const progressSteps = document.getElementById('progress-steps');
+            const liveOutput = document.getElementById('live-output');
+            const statusText = {
+                queued: '⏳ Waiting for a free AI agent...',
+                running: '🤖 AI agents are working on your problem...'
+            };
+            const streamed = {};
+            let currentAgent = null;
+
+            currentJobId = jobId;
+            document.getElementById('stop-btn').style.display = 'inline-block';
+
+            function write(agent, text) {
+                if (agent !== currentAgent) {
+                    liveOutput.textContent += `\n\n── ${agent} ──\n`;
+                    currentAgent = agent;
+                }
+                liveOutput.textContent += text;
+                liveOutput.scrollTop = liveOutput.scrollHeight;
+            }
+
+            const source = new EventSource(`/jobs/${jobId}/events`);
+            source.addEventListener('status', e => {
+                const data = JSON.parse(e.data);
+                if (statusText[data.status]) progressText.textContent = statusText[data.status];
+            });
+            source.addEventListener('token', e => {
+                const data = JSON.parse(e.data);
+                streamed[data.agent] = true;
+                write(data.agent, data.text);
+            });
+            source.addEventListener('step', e => {
+                const data = JSON.parse(e.data);
+                progressSteps.textContent = `${data.agent} is working...`;
+                // With token streaming the step text has already been shown
+                if (!streamed[data.agent]) write(data.agent, `\n${data.text}\n`);
+            });
+            source.addEventListener('task', e => {
+                progressSteps.textContent = `✅ ${JSON.parse(e.data).agent} finished`;
+            });
+            source.addEventListener('done', e => {
+                source.close();
+                const job = JSON.parse(e.data);
+                const messages = {
+                    timed_out: '⏰ Request timeout: The AI agents took too long to process your request. Please try again with a more specific question or contact support.',
+                    cancelled: '🛑 Stopped. Refine your question and try again.'
+                };
+                if (job.status === 'done') {
+                    finishStream(null, job.result);
+                } else if (job.error_type === 'PoolExhausted') {
+                    finishStream('🚦 All AI agents are busy right now. Please try again in a minute.');
+                } else {
+                    finishStream(messages[job.status] || `🤖 AI Processing Error: ${job.error}`);
+                }
+            });
+            source.onerror = () => {
+                // EventSource reconnects on its own unless the stream is gone for good
+                if (source.readyState === EventSource.CLOSED) finishStream('❌ Lost connection to the server.');
+            };
+        }
+
+        function stopJob() {
+            if (currentJobId) fetch(`/jobs/${currentJobId}`, { method: 'DELETE' });
+        }
 
+        function finishStream(message, answer) {
+            const submitBtn = document.getElementById('submit-btn');
+            const result = document.getElementById('stream-result');
+            currentJobId = null;
+            submitBtn.disabled = false;
+            submitBtn.value = 'Get AI-Powered Help';
+            document.getElementById('stop-btn').style.display = 'none';
+            document.getElementById('progress-container').style.display = 'none';
+
+            const container = document.createElement('div');
+            container.className = 'result-container';
+            const heading = document.createElement('h3');
+            heading.textContent = '🤖 AI Agent Response:';
+            container.appendChild(heading);
+            if (answer !== undefined) {
+                const downloads = document.createElement('div');
+                downloads.style.marginBottom = '15px';
+                downloads.innerHTML = '<strong>💾 Download Results:</strong> ' +
+                    '<a href="/download/txt" style="margin: 0 5px; padding: 5px 10px; background: #28a745; color: white; text-decoration: none; border-radius: 3px; font-size: 0.9em;">📄 TXT</a>' +
+                    '<a href="/download/json" style="margin: 0 5px; padding: 5px 10px; background: #007bff; color: white; text-decoration: none; border-radius: 3px; font-size: 0.9em;">📋 JSON</a>' +
+                    '<a href="/download/html" style="margin: 0 5px; padding: 5px 10px; background: #fd7e14; color: white; text-decoration: none; border-radius: 3px; font-size: 0.9em;">🌐 HTML</a>';
+                container.appendChild(downloads);
+            }
+            const pre = document.createElement('pre');
+            pre.textContent = answer !== undefined ? answer : message;
+            container.appendChild(pre);
+            result.appendChild(container);
+        }
     </script>
 </head>
 <body>
@@ -564,13 +1148,17 @@ HTML = """
         <div class="content">
             <div class="section">
                 <h2>Oracle EPM Problem Solver</h2>
-                <form id="epm-form" method="post" action="/" enctype="multipart/form-data" onsubmit="return showProgress()">
+                <form id="epm-form" method="post" action="/" enctype="multipart/form-data" onsubmit="return submitProblem(event)">
                     <div class="form-group">
                         <textarea name="problem" 
                                   placeholder="Describe your Oracle EPM issue in detail. Include module (FCCS, EPBCS, Essbase, etc.), error messages, and what you were trying to accomplish..."
                                   required>{{ request.form.problem or '' }}</textarea>
                     </div>
 
+                    <div class="form-group">
+                        <label><input type="checkbox" name="escalate" value="1" {{ 'checked' if request.form.escalate }}> 🧠 Deep analysis (always use the largest model)</label>
+                    </div>
+
                     <input type="submit" id="submit-btn" value="Get AI-Powered Help">
                 </form>
 
@@ -580,8 +1168,12 @@ HTML = """
                         <div class="progress-fill"></div>
                     </div>
                     <div id="progress-steps" class="progress-steps">Step 1 of 10</div>
+                    <pre id="live-output" style="display: none; max-height: 400px; overflow-y: auto; white-space: pre-wrap; font-size: 0.85em; margin-top: 10px;"></pre>
+                    <button type="button" id="stop-btn" onclick="stopJob()" style="display: none; margin-top: 10px; padding: 8px 16px; border: none; border-radius: 5px; background: #dc3545; color: white; cursor: pointer;">🛑 Stop</button>
                 </div>
 
+                <div id="stream-result"></div>
+
                 <div class="agents-info">
                     <div class="agent-card">
                         <strong>💼 FCCS Expert</strong>
@@ -643,6 +1235,13 @@ HTML = """
                     </div>
                 {% endif %}
 
+                {% if pending %}
+                    <div class="result-container">
+                        <h3>⏳ AI agents are working on your problem...</h3>
+                        <p>This page refreshes every few seconds until the answer is ready.</p>
+                    </div>
+                {% endif %}
+
                 {% if result %}
                     <div class="result-container">
                         <h3>🤖 AI Agent Response:</h3>
@@ -745,7 +1344,7 @@ def rag_dashboard():
     """RAG Dashboard page with upload interface"""
     try:
         if db_rag_manager:
-            total_articles = len(db_rag_manager.get_all_articles())
+            total_articles = db_rag_manager.count_articles()
         else:
             total_articles = sum(len(docs) for docs in KNOWLEDGE_BASE.values())
 
@@ -765,42 +1364,60 @@ def rag_dashboard():
 
 @app.route('/rag-upload', methods=['POST'])
 def rag_upload():
-    """Handle PDF uploads to RAG system"""
+    """Queue PDF uploads for background ingestion and return a job ID immediately"""
     try:
         if 'pdf_files' not in request.files:
             return {"success": False, "error": "No files uploaded"}, 400
 
-        files = request.files.getlist('pdf_files')
-        processed_count = 0
-
-        for file in files:
+        # Spool uploads to disk so worker processes can read them after this request ends
+        spooled = []
+        rejected = []
+        duplicates = []
+        seen = set()
+        for file in request.files.getlist('pdf_files'):
             if file and file.filename and file.filename.endswith('.pdf'):
                 try:
-                    # Extract text from PDF
-                    pdf_text = extract_text_from_pdf(file)
-
-                    # Add to knowledge base if we have DB manager
-                    if db_rag_manager:
-                        db_rag_manager.add_article(
-                            title=f"Uploaded: {file.filename}",
-                            content=pdf_text[:2000],  # Limit content size
-                            module="Uploaded",
-                            keywords=["uploaded", "pdf", "document"],
-                            category="uploaded_docs"
-                        )
-
-                    processed_count += 1
-                    print(f"✅ Processed: {file.filename}")
-
-                except Exception as e:
-                    print(f"❌ Error processing {file.filename}: {e}")
+                    path, content_hash = spool_upload(file.stream, MAX_PDF_MB * 1024 * 1024)
+                except ValueError as e:
+                    rejected.append({"filename": file.filename, "error": str(e)})
                     continue
+                # Identical content (same file, any name) is only ingested once
+                if content_hash in seen or is_duplicate_upload(content_hash):
+                    os.remove(path)
+                    duplicates.append(file.filename)
+                    continue
+                seen.add(content_hash)
+                spooled.append((file.filename, path, content_hash))
+
+        if not spooled:
+            if duplicates and not rejected:
+                return {"success": True, "job_id": None, "files": 0, "duplicates": duplicates, "rejected": []}, 200
+            error = "; ".join(f"{r['filename']}: {r['error']}" for r in rejected) or "No PDF files in upload"
+            return {"success": False, "error": error, "rejected": rejected, "duplicates": duplicates}, 400
+
+        try:
+            job_id = upload_jobs.submit(spooled)
+        except UploadQueueFull as e:
+            for _, path, _ in spooled:
+                os.remove(path)
+            return {"success": False, "error": f"Upload queue is full, try again shortly ({e})"}, 429
 
-        return {"success": True, "processed": processed_count}
+        return {
+            "success": True, "job_id": job_id, "files": len(spooled),
+            "duplicates": duplicates, "rejected": rejected
+        }, 202
 
     except Exception as e:
         return {"success": False, "error": str(e)}, 500
 
+@app.route('/rag-upload/<job_id>')
+def rag_upload_status(job_id):
+    """Per-file progress of a background upload job"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return {"success": False, "error": "Unknown job"}, 404
+    return {"success": True, **job}
+
 @app.route('/knowledge-base')
 def knowledge_base():
     """Knowledge base management page"""
@@ -835,14 +1452,132 @@ def knowledge_base():
     except Exception as e:
         return f"Error loading knowledge base: {str(e)}", 500
 
+def is_escalation(value):
+    """Whether a form/JSON 'escalate' value asks for the large model"""
+    return value in (True, 1) or str(value).lower() in ("1", "true", "yes", "on")
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a crew run and return its job ID immediately; poll GET /jobs/<id> for the answer.
+
+    Questions answered without a crew come back as a finished job, with the answer, and status 200.
+    """
+    if crew_jobs is None:
+        return {"success": False, "error": "Service temporarily unavailable"}, 503
+
+    data = request.get_json(silent=True) or request.form
+    problem = (data.get('problem') or "").strip()
+    if not problem:
+        return {"success": False, "error": "Missing 'problem'"}, 400
+
+    pdf_text = ""
+    pdf_file = request.files.get('pdf_file')
+    if pdf_file and pdf_file.filename:
+        try:
+            with telemetry.span("pdf_extraction", detail="question"):
+                pdf_text = extract_text_from_pdf(
+                    pdf_file.stream, MAX_PDF_MB * 1024 * 1024, MAX_PDF_PAGES, cache=extraction_cache
+                )
+        except Exception as e:
+            return {"success": False, "error": f"Error processing PDF '{pdf_file.filename}': {e}"}, 400
+
+    payload, rag_results = prepare_request(problem, pdf_text, escalate=is_escalation(data.get('escalate')))
+    try:
+        job_id = start_job(payload)
+    except JobQueueFull as e:
+        return {"success": False, "error": f"Too many questions queued, try again shortly ({e})"}, 429
+
+    job = crew_jobs.get(job_id)
+    response = {
+        "success": True,
+        "job_id": job_id,
+        "status": job['status'],
+        "modules": payload['modules'],
+        "articles": [article_key(r['doc']) for r in rag_results],
+        "context": payload['packing'],
+        "tier": payload['tier'],
+        "coalesced": job['coalesced'],
+    }
+    if job['status'] == "done":
+        return {**response, "result": job['result']}, 200
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """Status and answer of a crew job; DELETE cancels it"""
+    if crew_jobs is None:
+        return {"success": False, "error": "Service temporarily unavailable"}, 503
+    if request.method == 'DELETE' and not crew_jobs.cancel(job_id):
+        return {"success": False, "error": "Unknown or finished job"}, 404
+    job = crew_jobs.get(job_id)
+    if job is None:
+        return {"success": False, "error": "Unknown job"}, 404
+    return {"success": True, **job}
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-sent events for a crew job: status changes, agent steps, LLM tokens, then the answer"""
+    if crew_jobs is None or crew_jobs.get(job_id) is None:
+        return {"success": False, "error": "Unknown job"}, 404
+
+    # Reconnecting browsers resume after the last event they saw
+    start = request.headers.get('Last-Event-ID', -1, type=int) + 1
+
+    def stream():
+        index = start
+        while True:
+            events, job = crew_jobs.events(job_id, index)
+            if job is None:
+                return
+            for event in events:
+                yield f"id: {index}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                index += 1
+            if not events:
+                if job['status'] not in ("queued", "running"):
+                    yield f"event: done\ndata: {json.dumps(job)}\n\n"
+                    return
+                yield ": keep-alive\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# What the no-JavaScript page shows for a job that did not finish with an answer
+JOB_MESSAGES = {
+    "timed_out": "⏰ Request timeout: The AI agents took too long to process your request. Please try again with a more specific question or contact support.",
+    "cancelled": "🛑 Stopped. Refine your question and try again.",
+}
+
+def job_message(job):
+    """Answer of a finished job, or the message to show instead"""
+    if job['status'] == "done":
+        return job['result']
+    if job['error_type'] == "PoolExhausted":
+        return "🚦 All AI agents are busy right now. Please try again in a minute."
+    return JOB_MESSAGES.get(job['status'], f"🤖 AI Processing Error: {job['error']}\n\nPlease try again or contact support if the issue persists.")
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     result = None
     rag_results = None
     pdf_content = None
     pdf_status = None
+    pending = False
+
+    # Without JavaScript the form post redirects here and the page reloads until the job has finished
+    job_id = request.args.get('job')
+    if request.method == 'GET' and job_id:
+        job = crew_jobs.get(job_id) if crew_jobs is not None else None
+        if job is None:
+            result = "❓ Unknown or expired question. Please ask again."
+        elif job['status'] in ("queued", "running"):
+            pending = True
+        else:
+            result = job_message(job)
 
-    if request.method == 'POST' and request.form.get('problem') and crew is not None:
+    if request.method == 'POST' and request.form.get('problem') and crew_jobs is not None:
         try:
             problem = request.form['problem']
             print(f"🔄 Processing request: {problem[:100]}...")
@@ -858,7 +1593,10 @@ def index():
                         pdf_status = "error"
                     else:
                         try:
-                            pdf_text = extract_text_from_pdf(pdf_file)
+                            with telemetry.span("pdf_extraction", detail="question"):
+                                pdf_text = extract_text_from_pdf(
+                                    pdf_file.stream, MAX_PDF_MB * 1024 * 1024, MAX_PDF_PAGES, cache=extraction_cache
+                                )
                             if len(pdf_text.strip()) < 10:
                                 pdf_content = f"⚠️ Warning: PDF '{pdf_file.filename}' appears to be empty or contains mostly images/unreadable text. Only {len(pdf_text)} characters extracted."
                                 pdf_status = "warning"
@@ -871,58 +1609,19 @@ def index():
                             pdf_content = f"❌ Error processing PDF '{pdf_file.filename}': {str(pdf_error)}"
                             pdf_status = "error"
 
-            # Search knowledge base for relevant information
-            search_query = f"{problem} {pdf_text[:200]}" if pdf_text else problem
-
-            # Use PostgreSQL RAG if available, fallback to in-memory search
-            if db_rag_manager:
-                db_results = db_rag_manager.search_articles(search_query)
-                rag_results = [{'doc': r['article'], 'score': r['score'], 'category': r['article']['category']} for r in db_results]
-            else:
-                rag_results = search_knowledge_base(search_query)
+            payload, rag_results = prepare_request(problem, pdf_text, escalate=is_escalation(request.form.get('escalate')))
 
-            rag_context = format_rag_context(rag_results)
-
-            print(f"🔍 RAG Search found {len(rag_results)} relevant articles")
-
-            # Combine user problem with RAG context and PDF content
-            enhanced_problem = f"{rag_context}\nUSER PROBLEM: {problem}"
-            if pdf_text:
-                enhanced_problem += f"\n\nUPLOADED PDF CONTENT:\n{pdf_text}\n"
-
-            print("🤖 Starting AI agent processing...")
-
-            # Process with AI agents with timeout handling
+            # Crew runs go on the bounded crew job queue; the browser is sent to a page that waits for the job
             try:
-                import threading
-                import time
-
-                result_container = [None]
-                error_container = [None]
-
-                def ai_worker():
-                    try:
-                        result_container[0] = crew.kickoff(inputs={"problem": enhanced_problem})
-                    except Exception as e:
-                        error_container[0] = e
-
-                # Start AI processing in separate thread
-                ai_thread = threading.Thread(target=ai_worker)
-                ai_thread.daemon = True
-                ai_thread.start()
-
-                # Wait for completion with 5-minute timeout
-                ai_thread.join(timeout=300)
-
-                if ai_thread.is_alive():
-                    result = "⏰ Request timeout: The AI agents took too long to process your request. Please try again with a more specific question or contact support."
-                    print("⏰ AI processing timeout occurred")
-                elif error_container[0]:
-                    raise error_container[0]
-                else:
-                    result = result_container[0]
-                    print("✅ AI processing completed successfully")
-
+                job_id = start_job(payload)
+                job = crew_jobs.get(job_id)
+                if job['status'] != "done":
+                    return redirect(f"/?job={job_id}")
+                result = job['result']
+
+            except JobQueueFull as e:
+                result = "🚦 All AI agents are busy right now. Please try again in a minute."
+                print(f"🚦 Crew job queue full: {e}")
             except Exception as ai_error:
                 result = f"🤖 AI Processing Error: {str(ai_error)}\n\nPlease try again or contact support if the issue persists."
                 print(f"❌ AI processing error: {ai_error}")
@@ -940,11 +1639,16 @@ def index():
         except Exception as e:
             result = f"❌ System Error: {str(e)}\n\nPlease check your input and try again."
             print(f"❌ System error: {e}")
-    elif request.method == 'POST' and request.form.get('problem') and crew is None:
+    elif request.method == 'POST' and request.form.get('problem') and crew_jobs is None:
         result = "Service temporarily unavailable. Please check configuration."
 
-    return render_template_string(HTML, result=result, rag_results=rag_results, pdf_content=pdf_content, pdf_status=pdf_status, request=request)
+    with telemetry.span("render"):
+        return render_template_string(HTML, result=result, rag_results=rag_results, pdf_content=pdf_content, pdf_status=pdf_status, pending=pending, request=request)
+
 
+# Under the debug reloader only the child process serves requests, so the watching parent skips warm-up
+if WARM_UP and (__name__ != '__main__' or os.environ.get("WERKZEUG_RUN_MAIN")):
+    threading.Thread(target=init_services, name="warm-up", daemon=True).start()
 
 if __name__ == '__main__':
-    app.run(debug=True, host="0.0.0.0", port=3000)
\ No newline at end of file
+    app.run(debug=True, host="0.0.0.0", port=PORT)
\ No newline at end of file
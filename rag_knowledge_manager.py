@@ -1,27 +1,225 @@
 
+import hashlib
 import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime
 import json
 
+# Articles from these modules are relevant to every routed module
+SHARED_MODULES = ["general", "uploaded"]
+
+# Columns returned to callers (everything except the internal search_vector)
+ARTICLE_COLUMNS = (
+    "id, article_id, title, content, module, category, keywords, "
+    "document_id, chunk_index, page_start, page_end, created_at, updated_at"
+)
+
+# websearch_to_tsquery negation: "-word" or '-"a phrase"' at the start of a word
+NEGATION_RE = re.compile(r'(?:^|(?<=\s))-("[^"]*"|\S+)')
+
+def split_negations(query):
+    """Split a web-search style query into (positive part, negated terms as their own query)"""
+    negated = [match.group(1) for match in NEGATION_RE.finditer(query)]
+    return NEGATION_RE.sub(" ", query), " ".join(negated)
+
+def content_hash(text):
+    """SHA-256 hex digest of article content, matching encode(sha256(convert_to(content, 'UTF8')), 'hex')"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ConnectionPoolTimeout(Exception):
+    """Raised when no database connection frees up within the pool timeout"""
+
+class ConnectionPool:
+    """Thread-safe connection pool with health checks and reconnect on failure.
+
+    `connect` is any zero-argument callable returning a DB-API connection
+    (psycopg2.connect bound to a DSN in production, a stand-in in tests).
+    Idle connections unused for `check_interval` seconds are checked with
+    SELECT 1 before reuse. Connections that fail are thrown away and replaced
+    on the next checkout.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=10, check_interval=30):
+        self._connect = connect
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "in_use": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+        for _ in range(minconn):
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._lock:
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def getconn(self):
+        """Check out a healthy connection, blocking up to `timeout` seconds"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise ConnectionPoolTimeout(f"No database connection available within {self.timeout}s")
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = self._new_connection()
+                elif self._is_healthy(*idle):
+                    conn = idle[0]
+                else:
+                    self._discard(idle[0])
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+        return conn
+
+    def putconn(self, conn, broken=False):
+        """Return a connection to the pool, dropping it if it is broken"""
+        with self._lock:
+            self._stats["in_use"] -= 1
+        if broken or conn.closed:
+            self._discard(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success, rolls back on error"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, broken)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, idle=len(self._idle), max=self.maxconn)
+
 class RAGKnowledgeManager:
     """PostgreSQL-based RAG knowledge management system"""
     
-    def __init__(self):
+    def __init__(self, connect=None):
         self.database_url = os.environ.get('DATABASE_URL')
-        if not self.database_url:
-            raise ValueError("DATABASE_URL environment variable not found. Please set up PostgreSQL database in Replit.")
+        if connect is None:
+            if not self.database_url:
+                raise ValueError("DATABASE_URL environment variable not found. Please set up PostgreSQL database in Replit.")
+            connect = partial(psycopg2.connect, self.database_url)
+        self.pool = ConnectionPool(
+            connect,
+            minconn=int(os.environ.get('DB_POOL_MIN', '1')),
+            maxconn=int(os.environ.get('DB_POOL_MAX', '10')),
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+        )
+        self.listeners = []
         self.init_database()
     
     def get_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.database_url)
+        """Borrow a pooled database connection (use as a context manager)"""
+        return self.pool.connection()
+    
+    def pool_stats(self):
+        """Connection pool instrumentation: checkouts, reconnects, waits, idle/in-use counts"""
+        return self.pool.stats()
+    
+    def close(self):
+        """Close all idle pooled connections"""
+        self.pool.closeall()
+    
+    def add_listener(self, callback):
+        """Call `callback(article_ids)` after articles are updated or deleted"""
+        self.listeners.append(callback)
+    
+    def _notify(self, article_ids):
+        for callback in self.listeners:
+            try:
+                callback(article_ids)
+            except Exception as e:
+                print(f"Warning: article change listener failed: {e}")
     
     def init_database(self):
         """Initialize database tables"""
         with self.get_connection() as conn:
             with conn.cursor() as cur:
+                # Every migration already applied: skip the DDL (and its table locks) on startup
+                cur.execute("""
+                    SELECT to_regclass('idx_module') IS NOT NULL
+                       AND to_regclass('idx_search_vector') IS NOT NULL
+                       AND to_regclass('idx_document_id') IS NOT NULL
+                       AND to_regclass('idx_article_content_hash') IS NOT NULL
+                """)
+                if cur.fetchone()[0]:
+                    print("✅ Database tables already up to date")
+                    return
+                
                 cur.execute("""
                     CREATE TABLE IF NOT EXISTS knowledge_articles (
                         id SERIAL PRIMARY KEY,
@@ -47,74 +245,289 @@ class RAGKnowledgeManager:
                     ON knowledge_articles(module)
                 """)
                 
+                self._migrate_search_vector(cur)
+                self._migrate_documents(cur)
+                self._migrate_content_hash(cur)
+                
                 conn.commit()
                 print("✅ Database tables initialized successfully")
     
-    def add_article(self, title, content, module, keywords, category="general"):
-        """Add new article to knowledge base"""
+    def _migrate_search_vector(self, cur):
+        """Add the weighted full-text search column and its GIN index.
+
+        Adding a STORED generated column rewrites the table, which backfills
+        search_vector for every existing row. Safe to run on every startup.
+        """
+        # array_to_string is only STABLE; generated columns need an IMMUTABLE expression
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION knowledge_keywords_text(text[])
+            RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE
+            AS $$ SELECT array_to_string($1, ' ') $$
+        """)
+        
+        cur.execute("""
+            ALTER TABLE knowledge_articles
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', knowledge_keywords_text(keywords)), 'B') ||
+                setweight(to_tsvector('english', coalesce(content, '')), 'C')
+            ) STORED
+        """)
+        
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_search_vector 
+            ON knowledge_articles USING GIN(search_vector)
+        """)
+    
+    def _migrate_documents(self, cur):
+        """Add the parent-document table and link chunk rows in knowledge_articles to it"""
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS knowledge_documents (
+                id SERIAL PRIMARY KEY,
+                document_id VARCHAR(100) UNIQUE NOT NULL,
+                title TEXT NOT NULL,
+                module VARCHAR(50) NOT NULL,
+                page_count INTEGER,
+                chunk_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        cur.execute("""
+            ALTER TABLE knowledge_articles
+            ADD COLUMN IF NOT EXISTS document_id VARCHAR(100)
+                REFERENCES knowledge_documents(document_id) ON DELETE CASCADE,
+            ADD COLUMN IF NOT EXISTS chunk_index INTEGER,
+            ADD COLUMN IF NOT EXISTS page_start INTEGER,
+            ADD COLUMN IF NOT EXISTS page_end INTEGER
+        """)
+        
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_document_id 
+            ON knowledge_articles(document_id)
+        """)
+    
+    def _migrate_content_hash(self, cur):
+        """Add content hashes used to make duplicate uploads a no-op.
+
+        knowledge_documents.content_hash is the SHA-256 of the uploaded file.
+        knowledge_articles.content_hash is the SHA-256 of the article text, and
+        is unique per parent document (standalone articles share one scope).
+        The first run backfills hashes and drops duplicate rows left by earlier
+        uploads, keeping the oldest, so the unique index can be built.
+        """
+        cur.execute("""
+            ALTER TABLE knowledge_documents
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64) UNIQUE
+        """)
+        
+        cur.execute("""
+            ALTER TABLE knowledge_articles
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)
+        """)
+        
+        cur.execute("SELECT to_regclass('idx_article_content_hash') IS NOT NULL")
+        if cur.fetchone()[0]:
+            return
+        
+        cur.execute("""
+            UPDATE knowledge_articles
+            SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+            WHERE content_hash IS NULL
+        """)
+        
+        cur.execute("""
+            DELETE FROM knowledge_articles a
+            USING knowledge_articles b
+            WHERE a.content_hash = b.content_hash
+              AND COALESCE(a.document_id, '') = COALESCE(b.document_id, '')
+              AND a.id > b.id
+        """)
+        if cur.rowcount:
+            print(f"🧹 Removed {cur.rowcount} duplicate articles")
+        
+        cur.execute("""
+            CREATE UNIQUE INDEX idx_article_content_hash 
+            ON knowledge_articles (content_hash, COALESCE(document_id, ''))
+        """)
+    
+    def find_document_by_hash(self, file_hash):
+        """document_id of a previously uploaded file with this SHA-256, or None"""
         with self.get_connection() as conn:
             with conn.cursor() as cur:
-                article_id = f"{module.lower()}_{int(datetime.now().timestamp())}"
+                cur.execute("""
+                    SELECT document_id FROM knowledge_documents 
+                    WHERE content_hash = %s
+                """, (file_hash,))
+                
+                result = cur.fetchone()
+                return result[0] if result else None
+    
+    def add_document(self, title, chunks, module="Uploaded", category="uploaded_docs", page_count=None,
+                     file_hash=None):
+        """Store a chunked document: one parent row plus one article row per chunk.
+
+        `chunks` are dicts with text, index, page_start, page_end and keywords.
+        Everything is written in a single transaction. Returns the document_id
+        and the article_ids of the chunks stored (chunks whose text is already
+        in the document are skipped); if a file with the same `file_hash` is
+        already stored, nothing is written and its document_id is returned
+        with no article_ids.
+        """
+        document_id = f"doc_{uuid.uuid4().hex[:12]}"
+        now = datetime.now()
+        rows = [
+            (
+                f"{document_id}_c{chunk['index']:04d}",
+                f"{title} (p. {chunk['page_start']}-{chunk['page_end']})",
+                chunk['text'], module, category, chunk['keywords'], content_hash(chunk['text']),
+                document_id, chunk['index'], chunk['page_start'], chunk['page_end'], now, now
+            )
+            for chunk in chunks
+        ]
+        
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO knowledge_documents (document_id, title, module, page_count, chunk_count, content_hash)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (content_hash) DO NOTHING
+                    RETURNING document_id
+                """, (document_id, title, module, page_count, len(rows), file_hash))
+                
+                if cur.fetchone() is None:
+                    # Looked up on this connection: borrowing a second one could wait out the pool
+                    cur.execute("""
+                        SELECT document_id FROM knowledge_documents 
+                        WHERE content_hash = %s
+                    """, (file_hash,))
+                    existing = cur.fetchone()[0]
+                    print(f"♻️ Document already stored: {existing}")
+                    return existing, []
+                
+                # Chunks repeating text already in this document (boilerplate) are skipped
+                inserted = execute_values(cur, """
+                    INSERT INTO knowledge_articles 
+                    (article_id, title, content, module, category, keywords, content_hash,
+                     document_id, chunk_index, page_start, page_end, created_at, updated_at)
+                    VALUES %s
+                    ON CONFLICT (content_hash, COALESCE(document_id, '')) DO NOTHING
+                    RETURNING article_id
+                """, rows, fetch=True)
+                article_ids = [row[0] for row in inserted]
+                
+                cur.execute("""
+                    UPDATE knowledge_documents SET chunk_count = %s 
+                    WHERE document_id = %s
+                """, (len(article_ids), document_id))
+                
+                conn.commit()
+                skipped = len(rows) - len(article_ids)
+                print(f"✅ Document added: {document_id} ({len(article_ids)} chunks"
+                      f"{f', {skipped} duplicate chunks skipped' if skipped else ''})")
+                return document_id, article_ids
+    
+    def delete_document(self, document_id):
+        """Delete a document and all of its chunks"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT article_id FROM knowledge_articles 
+                    WHERE document_id = %s
+                """, (document_id,))
+                article_ids = [row[0] for row in cur.fetchall()]
+                
+                cur.execute("""
+                    DELETE FROM knowledge_documents 
+                    WHERE document_id = %s
+                """, (document_id,))
                 
+                deleted = cur.rowcount > 0
+                conn.commit()
+        
+        if deleted:
+            self._notify(article_ids)
+        return deleted
+    
+    def add_article(self, title, content, module, keywords, category="general"):
+        """Add new article to knowledge base.
+
+        Adding content that is already stored as a standalone article is a
+        no-op that returns the existing article_id.
+        """
+        article_id = f"{module.lower()}_{uuid.uuid4().hex[:12]}"
+        digest = content_hash(content)
+        
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO knowledge_articles 
-                    (article_id, title, content, module, category, keywords, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    (article_id, title, content, module, category, keywords, content_hash, created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (content_hash, COALESCE(document_id, '')) DO NOTHING
                     RETURNING article_id
                 """, (
-                    article_id, title, content, module, category, keywords,
+                    article_id, title, content, module, category, keywords, digest,
                     datetime.now(), datetime.now()
                 ))
                 
                 result = cur.fetchone()
+                if result is None:
+                    cur.execute("""
+                        SELECT article_id FROM knowledge_articles 
+                        WHERE content_hash = %s AND document_id IS NULL
+                    """, (digest,))
+                    result = cur.fetchone()
+                    print(f"♻️ Article already exists: {result[0]}")
+                    return result[0]
+                
                 conn.commit()
                 print(f"✅ Article added: {article_id}")
                 return result[0]
     
-    def search_articles(self, query, max_results=5):
-        """Search articles by query with PostgreSQL full-text search"""
-        query_lower = query.lower()
+    def search_articles(self, query, max_results=5, module=None):
+        """Search articles with ranked PostgreSQL full-text search.
+
+        The query is parsed with websearch_to_tsquery; its positive terms are
+        ORed, so a natural-language question matches articles that cover any
+        of them, and articles with any negated term ("-word") are excluded:
+        "a b -c" becomes ('a' | 'b') & !'c'. ts_rank_cd then ranks by how many terms
+        match, how close together they are, and in which field. When `module`
+        is given, only that module's articles and shared (General/Uploaded)
+        articles are considered.
+        """
+        modules = [module.lower()] + SHARED_MODULES if module else None
+        positive, negated = split_negations(query)
         
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Search using multiple criteria
-                cur.execute("""
-                    SELECT *, 
-                           CASE 
-                               WHEN LOWER(title) LIKE %s THEN 3
-                               ELSE 0
-                           END +
-                           CASE 
-                               WHEN keywords && %s THEN 2
-                               ELSE 0
-                           END +
-                           CASE 
-                               WHEN LOWER(content) LIKE %s THEN 1
-                               ELSE 0
-                           END as relevance_score
-                    FROM knowledge_articles
-                    WHERE LOWER(title) LIKE %s 
-                       OR keywords && %s
-                       OR LOWER(content) LIKE %s
+                excluded = """
+                    && !!regexp_replace(websearch_to_tsquery('english', %s)::text, ' & ', ' | ', 'g')::tsquery
+                """ if negated else ""
+                cur.execute(f"""
+                    WITH q AS (
+                        SELECT regexp_replace(
+                            websearch_to_tsquery('english', %s)::text, ' & ', ' | ', 'g'
+                        )::tsquery {excluded} AS query
+                    )
+                    SELECT {ARTICLE_COLUMNS},
+                           ts_rank_cd(search_vector, q.query, 1)::float8 AS relevance_score
+                    FROM knowledge_articles, q
+                    WHERE search_vector @@ q.query
+                      AND (%s::text[] IS NULL OR LOWER(module) = ANY(%s::text[]))
                     ORDER BY relevance_score DESC, created_at DESC
                     LIMIT %s
-                """, (
-                    f'%{query_lower}%',  # title search
-                    query_lower.split(),  # keywords array search
-                    f'%{query_lower}%',  # content search
-                    f'%{query_lower}%',  # title filter
-                    query_lower.split(),  # keywords filter
-                    f'%{query_lower}%',  # content filter
-                    max_results
-                ))
+                """, (positive, *([negated] if negated else []), modules, modules, max_results))
                 
                 results = []
                 for row in cur.fetchall():
-                    if row['relevance_score'] > 0:
-                        results.append({
-                            'article': dict(row),
-                            'score': row['relevance_score']
-                        })
+                    article = dict(row)
+                    score = article.pop('relevance_score')
+                    results.append({
+                        'article': article,
+                        'score': round(score, 4)
+                    })
                 
                 return results
     
@@ -122,18 +535,31 @@ class RAGKnowledgeManager:
         """Get specific article by ID"""
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT * FROM knowledge_articles 
+                cur.execute(f"""
+                    SELECT {ARTICLE_COLUMNS} FROM knowledge_articles 
                     WHERE article_id = %s
                 """, (article_id,))
                 
                 result = cur.fetchone()
                 return dict(result) if result else None
     
+    def get_articles(self, article_ids):
+        """Get several articles by ID in one query; missing IDs are left out"""
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"""
+                    SELECT {ARTICLE_COLUMNS} FROM knowledge_articles 
+                    WHERE article_id = ANY(%s)
+                """, (list(article_ids),))
+                
+                return [dict(row) for row in cur.fetchall()]
+    
     def update_article(self, article_id, **updates):
         """Update existing article"""
         if not updates:
             return False
+        if 'content' in updates:
+            updates['content_hash'] = content_hash(updates['content'])
             
         set_clause = ", ".join([f"{key} = %s" for key in updates.keys()])
         values = list(updates.values())
@@ -149,7 +575,10 @@ class RAGKnowledgeManager:
                 
                 updated = cur.rowcount > 0
                 conn.commit()
-                return updated
+        
+        if updated:
+            self._notify([article_id])
+        return updated
     
     def delete_article(self, article_id):
         """Delete article by ID"""
@@ -162,58 +591,235 @@ class RAGKnowledgeManager:
                 
                 deleted = cur.rowcount > 0
                 conn.commit()
-                return deleted
+        
+        if deleted:
+            self._notify([article_id])
+        return deleted
+    
+    def count_articles(self):
+        """Number of stored articles"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT count(*) FROM knowledge_articles")
+                return cur.fetchone()[0]
+    
+    def has_articles(self):
+        """Whether any article is stored, without counting them all"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT EXISTS (SELECT 1 FROM knowledge_articles)")
+                return cur.fetchone()[0]
     
     def get_all_articles(self, module=None):
         """Get all articles, optionally filtered by module"""
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 if module:
-                    cur.execute("""
-                        SELECT * FROM knowledge_articles 
+                    cur.execute(f"""
+                        SELECT {ARTICLE_COLUMNS} FROM knowledge_articles 
                         WHERE module = %s
                         ORDER BY created_at DESC
                     """, (module,))
                 else:
-                    cur.execute("""
-                        SELECT * FROM knowledge_articles 
+                    cur.execute(f"""
+                        SELECT {ARTICLE_COLUMNS} FROM knowledge_articles 
                         ORDER BY created_at DESC
                     """)
                 
                 return [dict(row) for row in cur.fetchall()]
     
+    def bulk_upsert_articles(self, articles, page_size=1000):
+        """Insert or update many standalone articles in one transaction.
+
+        `articles` are dicts with title, content, module and optionally id,
+        keywords and category. The id is the stable key: re-loading a
+        corpus updates those rows in place instead of duplicating them.
+        Without an id one is derived from the module and content hash.
+        Articles whose content is already stored under another id are skipped.
+        Returns (upserted, skipped).
+        """
+        rows = {}
+        by_hash = {}
+        skipped = 0
+        now = datetime.now()
+        for doc in articles:
+            digest = content_hash(doc['content'])
+            article_id = doc.get('id') or f"{doc['module'].lower()}_{digest[:12]}"
+            if by_hash.get(digest, article_id) != article_id:
+                skipped += 1
+                continue
+            by_hash[digest] = article_id
+            rows[article_id] = (
+                article_id, doc['title'], doc['content'], doc['module'],
+                doc.get('category', 'general'), list(doc.get('keywords') or []), digest, now, now
+            )
+        # A repeated id keeps its last content
+        by_hash = {row[6]: article_id for article_id, row in rows.items()}
+        
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                # Content already stored under a different id would violate the hash index
+                cur.execute("""
+                    SELECT content_hash, article_id FROM knowledge_articles 
+                    WHERE document_id IS NULL AND content_hash = ANY(%s)
+                """, (list(by_hash),))
+                for digest, existing_id in cur.fetchall():
+                    if by_hash[digest] != existing_id:
+                        del rows[by_hash[digest]]
+                        skipped += 1
+                
+                execute_values(cur, """
+                    INSERT INTO knowledge_articles 
+                    (article_id, title, content, module, category, keywords, content_hash, created_at, updated_at)
+                    VALUES %s
+                    ON CONFLICT (article_id) DO UPDATE SET
+                        title = EXCLUDED.title,
+                        content = EXCLUDED.content,
+                        module = EXCLUDED.module,
+                        category = EXCLUDED.category,
+                        keywords = EXCLUDED.keywords,
+                        content_hash = EXCLUDED.content_hash,
+                        updated_at = EXCLUDED.updated_at
+                """, list(rows.values()), page_size=page_size)
+                
+                conn.commit()
+        
+        # Upserts may have changed existing articles
+        self._notify(list(rows))
+        print(f"✅ Bulk upserted {len(rows)} articles ({skipped} duplicates skipped)")
+        return len(rows), skipped
+    
     def import_from_knowledge_base(self, knowledge_base_dict):
         """Import articles from the existing KNOWLEDGE_BASE dictionary"""
-        imported_count = 0
-        
-        for category, documents in knowledge_base_dict.items():
-            for doc in documents:
+        upserted, _skipped = self.bulk_upsert_articles(
+            dict(doc, category=category)
+            for category, documents in knowledge_base_dict.items()
+            for doc in documents
+        )
+        print(f"✅ Imported {upserted} articles to PostgreSQL database")
+        return upserted
+
+# Fields every imported article must have (id, keywords and category are optional)
+REQUIRED_ARTICLE_FIELDS = ("title", "content", "module")
+
+def _check_article(doc, where):
+    if not isinstance(doc, dict):
+        raise ValueError(f"{where}: expected an article object, got {type(doc).__name__}")
+    missing = [field for field in REQUIRED_ARTICLE_FIELDS if not doc.get(field)]
+    if missing:
+        raise ValueError(f"{where}: article is missing {', '.join(missing)}")
+
+def load_corpus(path, category=None):
+    """Read articles from a JSON or JSONL file.
+
+    JSON may be a list of articles or a {category: [articles]} mapping like
+    KNOWLEDGE_BASE; JSONL is one article per line. `category` overrides the
+    category of every article. Raises ValueError naming the line (JSONL) or
+    article number (JSON) of the first article that is not valid JSON or
+    lacks a required field.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            articles = []
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
                 try:
-                    self.add_article(
-                        title=doc['title'],
-                        content=doc['content'],
-                        module=doc['module'],
-                        keywords=doc['keywords'],
-                        category=category
-                    )
-                    imported_count += 1
-                except Exception as e:
-                    print(f"❌ Error importing article {doc.get('id', 'unknown')}: {e}")
+                    doc = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_no}: invalid JSON: {e}") from e
+                _check_article(doc, f"{path}:{line_no}")
+                articles.append(doc)
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                articles = [dict(doc, category=cat) for cat, docs in data.items() for doc in docs]
+            else:
+                articles = data
+            for i, doc in enumerate(articles, 1):
+                _check_article(doc, f"{path}: article {i}")
+    if category:
+        articles = [dict(doc, category=category) for doc in articles]
+    return articles
+
+def benchmark_import(rag_manager, n=1000):
+    """Time row-by-row add_article against bulk_upsert_articles on a synthetic corpus.
+
+    Rows are written under the 'benchmark' category, and only the rows this
+    run wrote are removed afterwards.
+    """
+    run = uuid.uuid4().hex[:8]
+    articles = [{
+        "id": f"bench_{run}_{i:06d}",
+        "title": f"Benchmark article {i}",
+        "content": f"Synthetic benchmark content {run} {i}: consolidation journals, data forms and rules.",
+        "module": "Benchmark",
+        "keywords": ["benchmark", f"article{i}"],
+        "category": "benchmark",
+    } for i in range(n)]
+    
+    # add_article picks its own ids, so they are collected for cleanup
+    written = [doc['id'] for doc in articles]
+    
+    def cleanup():
+        with rag_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM knowledge_articles WHERE article_id = ANY(%s)", (written,))
+                conn.commit()
+    
+    results = {}
+    try:
+        start = time.perf_counter()
+        for doc in articles:
+            written.append(
+                rag_manager.add_article(doc['title'], doc['content'], doc['module'], doc['keywords'], doc['category'])
+            )
+        results['row_by_row'] = time.perf_counter() - start
+        cleanup()
         
-        print(f"✅ Imported {imported_count} articles to PostgreSQL database")
-        return imported_count
+        start = time.perf_counter()
+        rag_manager.bulk_upsert_articles(articles)
+        results['bulk'] = time.perf_counter() - start
+        
+        # Re-loading the same corpus takes the update path
+        start = time.perf_counter()
+        rag_manager.bulk_upsert_articles(articles)
+        results['bulk_reload'] = time.perf_counter() - start
+    finally:
+        cleanup()
+    
+    for name, elapsed in results.items():
+        print(f"⏱️ {name:<12} {elapsed:8.3f}s  {n / elapsed:10.0f} articles/s")
+    print(f"🚀 Bulk speedup: {results['row_by_row'] / results['bulk']:.1f}x")
+    return results
 
 # Initialize and populate database if needed
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Oracle EPM knowledge base database tools")
+    commands = parser.add_subparsers(dest="command")
+    load = commands.add_parser("import", help="Bulk load articles from JSON/JSONL files")
+    load.add_argument("files", nargs="+")
+    load.add_argument("--category", help="Override the category of every article")
+    load.add_argument("--page-size", type=int, default=1000, help="Rows per INSERT statement")
+    bench = commands.add_parser("benchmark", help="Compare bulk and row-by-row imports")
+    bench.add_argument("-n", type=int, default=1000, help="Number of synthetic articles")
+    args = parser.parse_args()
+    
     try:
         rag_manager = RAGKnowledgeManager()
         
-        # Check if database is empty
-        articles = rag_manager.get_all_articles()
-        if not articles:
-            print("📚 Database is empty. Would you like to import the existing knowledge base?")
-            # You can import from your KNOWLEDGE_BASE here if needed
+        if args.command == "import":
+            articles = [doc for path in args.files for doc in load_corpus(path, args.category)]
+            print(f"📥 Loading {len(articles)} articles from {len(args.files)} file(s)...")
+            start = time.perf_counter()
+            rag_manager.bulk_upsert_articles(articles, page_size=args.page_size)
+            print(f"⏱️ Done in {time.perf_counter() - start:.2f}s")
+        elif args.command == "benchmark":
+            benchmark_import(rag_manager, args.n)
         
+        articles = rag_manager.get_all_articles()
         print(f"📊 Database contains {len(articles)} articles")
         
     except Exception as e:
@@ -1,60 +1,175 @@
 import sys
 import os
 import json
+import random
+import time
+import argparse
 import asyncio
-from pathlib import Path  # ✅ This fixes the NameError
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 sys.path.append("src")  # ✅ Tells Python where to find your crew
 
-from oracle_epm_support.crew import build_crew
-
-
-sys.path.append("src")  # 👈 This is crucial
-
-from oracle_epm_support.crew import build_crew
-
-# 🔧 Add this line to let Python find the src/ folder
-sys.path.append("src")
-
-# CONFIG
-WAIT_BETWEEN = 4  # seconds between runs
-OUTPUT_PATH = Path("logs/test_results.csv")
+from oracle_epm_support.crew import CancelToken, CrewCancelled, kickoff_routed
+from oracle_epm_support.rag_system import route_problem
+from oracle_epm_support.rate_limit import AsyncTokenBucket
+from oracle_epm_support.response_cache import article_key
+from oracle_epm_support.results import ResultsWriter, export_results, read_results
+
+# CONFIG (overridable on the command line)
+CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))         # questions running at once
+RATE_PER_MINUTE = float(os.getenv("BATCH_RATE_PER_MINUTE", "30"))  # question starts per minute
+BURST = int(os.getenv("BATCH_BURST", "4"))                      # starts allowed back to back
+MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "3"))
+QUESTION_TIMEOUT = float(os.getenv("BATCH_QUESTION_TIMEOUT", "600"))
+OUTPUT_PATH = Path("logs/test_results.jsonl")
 INPUT_PATH = Path("test_questions.json")
 
-# Ensure logs/ exists
-os.makedirs("logs", exist_ok=True)
-
-# Load questions
-with open(INPUT_PATH, "r", encoding="utf-8") as f:
-    questions = json.load(f)
 
-# Load CrewAI system
-crew = build_crew()
-
-async def run_test(index: int, question: str):
-    print(f"🔍 [{index}/{len(questions)}] Question: {question}")
+def answer(question, timeout, prepare=None, answer_from_kb=None):
+    """Route and answer one question with freshly built crews (runs on a worker thread).
+
+    With `prepare` (app.prepare_request) the question gets the same knowledge
+    base retrieval and model tier as in the web app; `answer_from_kb` answers
+    the "kb" tier. Returns the measured row fields.
+    """
+    started = time.monotonic()
+    if prepare:
+        payload, _ = prepare(question)
+        modules, contexts, problem = payload["modules"], payload["contexts"], payload["enhanced_problem"]
+        article_ids = [article_key(doc) for doc in payload["articles"]]
+        packing, tier = payload["packing"], payload["tier"]
+    else:
+        modules, contexts, problem, article_ids, packing, tier = route_problem(question), None, question, [], {}, "large"
+
+    events = []
+    if tier == "kb":
+        output = answer_from_kb(payload)
+    else:
+        output = kickoff_routed(
+            modules, inputs={"problem": problem}, contexts=contexts, cancel=CancelToken(timeout),
+            on_event=events.append, tier=tier
+        )
+
+    tokens = {}
+    for event in events:
+        if event["type"] == "usage":
+            for key, value in event.items():
+                if key not in ("type", "modules"):
+                    tokens[key] = tokens.get(key, 0) + (value or 0)
+    return {
+        "modules": modules,
+        "tier": tier,
+        "article_ids": article_ids,
+        "wall_seconds": round(time.monotonic() - started, 3),
+        "agents": [{"agent": e["agent"], "seconds": e["seconds"]} for e in events if e["type"] == "task"],
+        "tokens": tokens,
+        "context": packing,
+        "response": str(output),
+    }
+
+
+async def run_test(index, question, total, args, bucket, semaphore, writer, prepare, answer_from_kb):
+    async with semaphore:
+        started_at = time.time()
+        for attempt in range(1, args.retries + 2):
+            await bucket.acquire()
+            print(f"🔍 [{index}/{total}] Question: {question} (attempt {attempt})")
+            attempt_started = time.monotonic()
+            try:
+                measured = await asyncio.to_thread(answer, question, args.timeout, prepare, answer_from_kb)
+                status = "ok"
+                break
+            except CrewCancelled as e:
+                # A timeout is a result, not a transient failure
+                measured, status = {"response": f"[TIMEOUT] {e}"}, "timeout"
+                break
+            except Exception as e:
+                measured, status = {"response": f"[ERROR] {e}"}, "error"
+                if attempt <= args.retries:
+                    delay = min(60, 2 ** attempt) * random.uniform(0.5, 1.5)
+                    print(f"🔁 [{index}/{total}] {e}; retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        measured.setdefault("wall_seconds", round(time.monotonic() - attempt_started, 3))
+
+    print(f"✅ [{index}/{total}] {status} in {measured['wall_seconds']:.1f}s: {measured['response'][:250]}...\n{'-'*60}")
+    writer.write({
+        "index": index,
+        "question": question,
+        "status": status,
+        "attempts": attempt,
+        "started_at": started_at,
+        **measured,
+    })
+
+
+def latest_rows(path):
+    """Most recent result per question; earlier failed attempts from crashed runs are superseded"""
+    latest = {}
+    for row in read_results(path):
+        latest[row["question"]] = row
+    return sorted(latest.values(), key=lambda row: row["index"])
+
+
+async def main(args):
+    with open(args.input, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    if not args.resume and args.output.exists():
+        args.output.unlink()
+    done = {row["question"] for row in latest_rows(args.output) if row["status"] == "ok"}
+    pending = [(i, q) for i, q in enumerate(questions, 1) if q not in done]
+    print(f"📋 {len(questions)} questions, {len(done)} already answered, {len(pending)} to run "
+          f"({args.concurrency} at a time, {args.rate:g}/min)")
+
+    # Crews block, so they run on threads; size the pool to the concurrency limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+    semaphore = asyncio.Semaphore(args.concurrency)
+    bucket = AsyncTokenBucket(rate=args.rate / 60, capacity=args.burst)
+
+    prepare = answer_from_kb = None
+    if args.retrieval:
+        # The app's services give the same knowledge base search and model tiers the web requests use
+        from app import answer_from_kb, init_services, prepare_request as prepare
+        init_services()
+
+    started = time.monotonic()
+    with ResultsWriter(str(args.output)) as writer:
+        await asyncio.gather(*(
+            run_test(i, q, len(questions), args, bucket, semaphore, writer, prepare, answer_from_kb) for i, q in pending
+        ))
+
+    print(f"🏁 Finished {len(pending)} questions in {time.monotonic() - started:.1f}s → {args.output}")
+    if args.export:
+        export(args)
+
+
+def export(args):
+    rows = latest_rows(args.output)
     try:
-        response = crew.kickoff(inputs={"problem": question})
-    except Exception as e:
-        response = f"[ERROR] {e}"
-
-    print(f"✅ Response: {str(response)[:250]}...\n{'-'*60}")
-
-    # Append to CSV
-    with open(OUTPUT_PATH, "a", encoding="utf-8") as out:
-        q_clean = question.replace('"', '""')
-        r_clean = str(response).replace('"', '""').replace("\n", " ")
-        out.write(f'"{q_clean}","{r_clean}"\n')
-
-    await asyncio.sleep(WAIT_BETWEEN)
-
-async def main():
-    # Write CSV header
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as out:
-        out.write("question,response\n")
+        export_results(rows, str(args.export))
+    except ImportError as e:
+        print(f"❌ {e}")
+        return
+    print(f"📤 Exported {len(rows)} results → {args.export}")
 
-    for i, q in enumerate(questions, 1):
-        await run_test(i, q)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the regression questions through the crews concurrently")
+    parser.add_argument("--input", type=Path, default=INPUT_PATH)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_PER_MINUTE, help="Question starts per minute")
+    parser.add_argument("--burst", type=int, default=BURST)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--timeout", type=float, default=QUESTION_TIMEOUT, help="Seconds per question")
+    parser.add_argument("--resume", action="store_true", help="Skip questions already answered in --output")
+    parser.add_argument("--no-retrieval", dest="retrieval", action="store_false",
+                        help="Skip knowledge base retrieval (no app import, no article IDs)")
+    parser.add_argument("--export", type=Path, help="Also write the results to this .csv or .parquet file")
+    parser.add_argument("--export-only", action="store_true", help="Only export an existing --output file")
+    args = parser.parse_args()
+    if args.export_only:
+        export(args)
+    else:
+        asyncio.run(main(args))
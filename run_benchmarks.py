@@ -0,0 +1,312 @@
+import sys
+import os
+import io
+import re
+import json
+import math
+import time
+import uuid
+import signal
+import socket
+import argparse
+import asyncio
+import tempfile
+import statistics
+import subprocess
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+sys.path.append("src")
+
+# Offline by default: answers must come from the fake model, never from the response cache
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+
+from oracle_epm_support import crew
+from oracle_epm_support.fake_llm import FakeLLM
+
+BASELINE_PATH = Path("logs/benchmark_baseline.json")
+QUESTIONS = json.loads(Path("test_questions.json").read_text(encoding="utf-8"))
+# The web server should accept connections within this many seconds of starting
+STARTUP_TARGET = 1.0
+# "import time: self [us] | cumulative | imported package", nested imports indented
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, elapsed):
+    return {
+        "n": len(latencies),
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "throughput": round(len(latencies) / elapsed, 3),
+    }
+
+
+def measure(fn, requests, concurrency):
+    """Call fn(i) `requests` times on `concurrency` threads; latency per call plus throughput"""
+    def timed(i):
+        started = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(requests)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def question(i):
+    # A unique suffix keeps every request a cache miss
+    return f"{QUESTIONS[i % len(QUESTIONS)]} (benchmark {i} {uuid.uuid4().hex[:6]})"
+
+
+def make_pdf(pages):
+    """Minimal text PDF (one Helvetica text line per line of each page), built by hand"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        # The built-in fonts only cover Latin-1; other characters (e.g. dashes in the questions) become "?"
+        text = text.encode("latin-1", "replace").decode("latin-1")
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.splitlines()]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out.encode("latin-1")))
+        out += f"{n} 0 obj\n{body}\nendobj\n"
+    xref = len(out.encode("latin-1"))
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def import_profile(env):
+    """Seconds to `import app` in a fresh interpreter, and import time (-X importtime) per top-level package"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import app failed: {result.stderr.strip().splitlines()[-1]}")
+    packages = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if name == "app" and not indent:
+            total = int(cumulative_us)
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + int(self_us)
+    return total / 1e6, {name: us / 1e6 for name, us in packages.items()}
+
+
+def time_to_listen(env, timeout=60):
+    """Seconds from launching `python app.py` until its port accepts connections"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    started = time.perf_counter()
+    # Own session, so the debug reloader's child process is stopped along with it
+    process = subprocess.Popen(
+        [sys.executable, "app.py"], env=dict(env, PORT=str(port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                return time.perf_counter() - started
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError(f"app.py exited with code {process.returncode}")
+                time.sleep(0.01)
+        raise RuntimeError(f"app.py was not listening after {timeout}s")
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def run_startup(args):
+    """Cold start: import time with its per-package breakdown, and time until the server is listening"""
+    env = dict(os.environ, WARM_UP="false")
+    imports, profiles = zip(*(import_profile(env) for _ in range(args.startup_runs)))
+    listen = [time_to_listen(dict(os.environ)) for _ in range(args.startup_runs)]
+    slowest = sorted(profiles[0].items(), key=lambda item: -item[1])[:args.startup_top]
+    startup = {
+        "import_seconds": round(statistics.median(imports), 4),
+        "listen_seconds": round(statistics.median(listen), 4),
+        "slowest_imports": {name: round(seconds, 4) for name, seconds in slowest},
+    }
+    print(f"⏱️ {'import app':<14} {startup['import_seconds']:.3f}s")
+    for name, seconds in slowest:
+        print(f"     {name:<28} {seconds:.3f}s")
+    mark = "✅" if startup["listen_seconds"] <= STARTUP_TARGET else "⚠️"
+    print(f"{mark} {'listening':<14} {startup['listen_seconds']:.3f}s (target {STARTUP_TARGET:g}s)")
+    return startup
+
+
+def agent_on_own_llm(make_agent, **kwargs):
+    """Build an agent on its own copy of the fake model it was given"""
+    return make_agent(**dict(kwargs, llm=kwargs["llm"].spawn()))
+
+
+def run_stages(args, fake):
+    import app as web
+
+    web.init_services()
+    client = web.app.test_client()
+    stages = {}
+
+    def record(name, concurrency, fn):
+        calls_before = fake.calls
+        result = measure(fn, args.requests, concurrency)
+        result["llm_calls"] = fake.calls - calls_before
+        stages[f"{name}@{concurrency}"] = result
+        print(f"⏱️ {name:<14} x{concurrency:<3} p50 {result['p50']:.3f}s  p95 {result['p95']:.3f}s  "
+              f"p99 {result['p99']:.3f}s  {result['throughput']:.2f}/s")
+
+    def index(i):
+        response = client.post("/", data={"problem": question(i)})
+        # Crew runs redirect to a page that reloads until the job has finished
+        if response.status_code == 302:
+            job_id = response.headers["Location"].split("job=")[1]
+            while client.get(f"/jobs/{job_id}").get_json()["status"] in ("queued", "running"):
+                time.sleep(0.01)
+            response = client.get(response.headers["Location"])
+        assert response.status_code == 200, response.status_code
+
+    def rag_upload(i):
+        pdf = make_pdf([
+            f"Benchmark document {i} {uuid.uuid4().hex}\n" + "\n".join(QUESTIONS)
+            for _ in range(args.pdf_pages)
+        ])
+        response = client.post("/rag-upload", data={"pdf_files": (io.BytesIO(pdf), f"benchmark_{i}.pdf")},
+                               content_type="multipart/form-data")
+        assert response.status_code == 202, response.get_json()
+        job_id = response.get_json()["job_id"]
+        while client.get(f"/rag-upload/{job_id}").get_json()["status"] == "running":
+            time.sleep(0.01)
+
+    for concurrency in args.concurrency:
+        # Stages in isolation: retrieval + prompt assembly, crew construction, crew run on the fake model
+        record("retrieval", concurrency, lambda i: web.prepare_request(question(i)))
+        payloads = [web.prepare_request(question(i))[0] for i in range(len(QUESTIONS))]
+        record("build_crew", concurrency,
+               lambda i: crew.build_crew(payloads[i % len(payloads)]["modules"], payloads[i % len(payloads)]["contexts"]))
+        record("kickoff", concurrency, lambda i: crew.kickoff_routed(
+            payloads[i % len(payloads)]["modules"],
+            inputs={"problem": payloads[i % len(payloads)]["enhanced_problem"]},
+            contexts=payloads[i % len(payloads)]["contexts"]
+        ))
+        # End to end through the web routes
+        record("index", concurrency, index)
+        record("rag_upload", concurrency, rag_upload)
+
+    return stages
+
+
+def run_batch_stage(args, stages):
+    import run_batch_tests_async as batch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        questions_path = Path(tmp) / "questions.json"
+        questions_path.write_text(json.dumps([question(i) for i in range(args.requests)]))
+        for concurrency in args.concurrency:
+            output = Path(tmp) / f"results_{concurrency}.jsonl"
+            started = time.perf_counter()
+            asyncio.run(batch.main(Namespace(
+                input=questions_path, output=output, concurrency=concurrency, rate=1e6, burst=concurrency,
+                retries=0, timeout=600, resume=False, retrieval=True, export=None
+            )))
+            rows = batch.latest_rows(output)
+            result = summarize([row["wall_seconds"] for row in rows], time.perf_counter() - started)
+            stages[f"batch@{concurrency}"] = result
+            print(f"⏱️ {'batch':<14} x{concurrency:<3} p50 {result['p50']:.3f}s  p95 {result['p95']:.3f}s  "
+                  f"p99 {result['p99']:.3f}s  {result['throughput']:.2f}/s")
+
+
+def compare(current, baseline, tolerance):
+    """Stages whose p95 or throughput regressed by more than `tolerance` (a fraction)"""
+    regressions = []
+    for name in ("import_seconds", "listen_seconds"):
+        base, now = (baseline.get("startup") or {}).get(name), (current.get("startup") or {}).get(name)
+        if base is not None and now is not None and now > base * (1 + tolerance):
+            regressions.append(f"startup: {name} {base:.3f}s → {now:.3f}s")
+    for name, base in baseline["stages"].items():
+        now = current["stages"].get(name)
+        if now is None:
+            continue
+        if now["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95']:.3f}s → {now['p95']:.3f}s")
+        if now["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']:.2f}/s → {now['throughput']:.2f}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks on a fake LLM")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per stage and concurrency level")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 4])
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--llm-tokens", type=int, default=200, help="Completion tokens per fake LLM call")
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--startup-runs", type=int, default=3, help="Cold starts to time (0 skips the startup stage)")
+    parser.add_argument("--startup-top", type=int, default=10, help="Slowest packages to list from the import profile")
+    parser.add_argument("--output", type=Path, default=Path("logs/benchmark_results.json"))
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {BASELINE_PATH}")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    # Every agent built from here on talks to its own fake model, as CrewAI gives each agent its own
+    # copy of a real one; the per-model token streams and role timings are keyed by instance
+    fake = FakeLLM(delay=args.llm_delay, completion_tokens=args.llm_tokens)
+    crew.claude = crew.claude_fast = fake
+    crew.Agent = partial(agent_on_own_llm, crew.Agent)
+
+    startup = run_startup(args) if args.startup_runs else None
+    stages = run_stages(args, fake)
+    run_batch_stage(args, stages)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k in ("requests", "concurrency", "llm_delay", "llm_tokens", "pdf_pages")},
+        "startup": startup,
+        "stages": stages,
+    }
+    os.makedirs(args.output.parent, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"📊 Results → {args.output}")
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2))
+        print(f"📌 Baseline saved → {BASELINE_PATH}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+    # Background upload workers and crew job threads would otherwise keep the process alive
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
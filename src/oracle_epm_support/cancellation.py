@@ -0,0 +1,53 @@
+import threading
+import time
+
+
+class CrewCancelled(TimeoutError):
+    """Raised inside a crew run once its CancelToken is cancelled or past its deadline.
+
+    A TimeoutError so CrewAI propagates it instead of retrying the agent's task.
+    """
+
+
+class CancelToken:
+    """Cooperative cancellation for a crew run.
+
+    `check` is installed as the crew's step and task callback, so it runs
+    after every agent step; once the token is cancelled or its deadline has
+    passed it raises CrewCancelled, and the agent makes no further LLM calls.
+    A child token (`parent=...`) is also cancelled with its parent, but
+    cancelling the child leaves the parent alone.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        self._event = threading.Event()
+        self.parent = parent
+        self.deadline = None
+        if timeout is not None:
+            self.start(timeout)
+
+    def start(self, timeout):
+        """Begin the deadline clock (e.g. when a queued job starts running)"""
+        self.deadline = time.monotonic() + timeout
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancel_requested(self):
+        """Cancelled explicitly, as opposed to running out of time"""
+        return self._event.is_set() or (self.parent is not None and self.parent.cancel_requested)
+
+    @property
+    def cancelled(self):
+        return (
+            self._event.is_set()
+            or (self.deadline is not None and time.monotonic() > self.deadline)
+            or (self.parent is not None and self.parent.cancelled)
+        )
+
+    def check(self, *_):
+        if self.cancel_requested:
+            raise CrewCancelled("Crew run cancelled")
+        if self.cancelled:
+            raise CrewCancelled("Crew run passed its deadline")
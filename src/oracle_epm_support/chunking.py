@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+
+from .search_index import tokenize
+
+# Blank lines separate paragraphs; short title-like lines start a new section
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+HEADING_RE = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s+\S.{0,80}|[A-Z][A-Z0-9 /&:-]{3,80})$")
+
+def split_sections(text):
+    """Split page text into paragraph blocks, breaking before heading-like lines"""
+    blocks = []
+    for paragraph in PARAGRAPH_RE.split(text):
+        current = []
+        for line in paragraph.splitlines():
+            if HEADING_RE.match(line.strip()) and current:
+                blocks.append("\n".join(current))
+                current = []
+            current.append(line)
+        if current:
+            blocks.append("\n".join(current))
+    return [b.strip() for b in blocks if b.strip()]
+
+def chunk_pages(pages, chunk_size=1500, overlap=200):
+    """Group (page_no, text) pages into overlapping, section-aligned chunks.
+
+    Sections are packed into a chunk until adding the next would exceed
+    `chunk_size` characters; a section longer than that is cut on word
+    boundaries. Each new chunk repeats the last ~`overlap` characters of the
+    previous one so context spanning a boundary is not lost; the repeated
+    text counts towards `chunk_size`. A last chunk with less than a quarter
+    of `chunk_size` of new text is merged into the one before it. Yields
+    dicts with the chunk index, text and the page range it covers.
+    """
+    overlap = min(overlap, chunk_size // 2)
+    # Longest piece that still fits in a chunk after the carried-over overlap and a separator
+    room = chunk_size - overlap - 2 if overlap else chunk_size
+    current, current_len = [], 0
+    has_tail = False  # current starts with the overlap carried from the last chunk
+    page_start = page_end = None
+    previous = None  # held back so a small last chunk can be merged into it
+    index = 0
+
+    def pieces(section):
+        while len(section) > room:
+            cut = section.rfind(" ", 0, room)
+            cut = cut if cut > room // 2 else room
+            yield section[:cut]
+            section = section[cut:].lstrip()
+        if section:
+            yield section
+
+    for page_no, text in pages:
+        for section in split_sections(text):
+            for piece in pieces(section):
+                if len(current) > has_tail and current_len + 2 + len(piece) > chunk_size:
+                    if previous:
+                        yield previous
+                    chunk_text = "\n\n".join(current)
+                    previous = {"index": index, "text": chunk_text, "page_start": page_start, "page_end": page_end}
+                    index += 1
+                    tail = chunk_text[-overlap:] if overlap else ""
+                    tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+                    current, current_len = ([tail], len(tail)) if tail else ([], 0)
+                    has_tail = bool(tail)
+                    page_start = page_end if tail else None
+                if page_start is None:
+                    page_start = page_no
+                page_end = page_no
+                current_len += len(piece) + (2 if current else 0)
+                current.append(piece)
+
+    new_text = "\n\n".join(current[has_tail:])
+    if previous and new_text and len(new_text) < chunk_size // 4:
+        previous.update(text=previous["text"] + "\n\n" + new_text, page_end=page_end)
+        new_text = ""
+    if previous:
+        yield previous
+    if new_text:
+        yield {"index": index, "text": "\n\n".join(current), "page_start": page_start, "page_end": page_end}
+
+def extract_keywords(text, top_n=8):
+    """Most frequent meaningful terms of a text, for the keywords column"""
+    counts = Counter(t for t in tokenize(text) if len(t) > 2 and not t.isdigit())
+    return [term for term, _ in counts.most_common(top_n)]
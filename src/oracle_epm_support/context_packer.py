@@ -0,0 +1,100 @@
+import math
+import re
+
+from .chunking import chunk_pages
+from .search_index import BM25Index, tokenize
+
+# Word pieces and single symbols; Claude's tokenizer averages about 4 characters per word token
+PIECE_RE = re.compile(r"\w+|[^\w\s]")
+PAGE_MARKER_RE = re.compile(r"^\[Page (\d+)\]\n", re.M)
+# Word 5-grams used to spot content a packed snippet already covers
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.5
+# Ties in relevance go to knowledge base articles, then to earlier PDF chunks
+KIND_PRIORITY = {"article": 0, "pdf": 1}
+
+
+def count_tokens(text):
+    """Approximate token count: one token per ~4 characters of a word, one per symbol"""
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in PIECE_RE.findall(text or "")
+    )
+
+
+def pdf_pages(pdf_text):
+    """(page_no, text) pairs of extract_text_from_pdf output, split on its [Page N] markers"""
+    parts = PAGE_MARKER_RE.split(pdf_text)
+    if len(parts) == 1:
+        return [(1, pdf_text)] if pdf_text.strip() else []
+    return [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts), 2)]
+
+
+def article_snippets(results):
+    """Snippets for knowledge base search results ({'doc', 'score'} dicts)"""
+    return [
+        {
+            "kind": "article",
+            "text": f"{r['doc']['title']}\n{r['doc']['content']}",
+            "score": r["score"],
+            "order": i,
+            "item": r,
+        }
+        for i, r in enumerate(results)
+    ]
+
+
+def pdf_snippets(query, pdf_text, chunk_size=1500, overlap=200):
+    """Chunks of an uploaded PDF as snippets scored by BM25 relevance to the query"""
+    chunks = list(chunk_pages(pdf_pages(pdf_text), chunk_size=chunk_size, overlap=overlap))
+    index = BM25Index()
+    index.add_many((chunk["index"], {"content": chunk["text"]}, {}) for chunk in chunks)
+    scores = {doc_id: score for score, doc_id, _ in index.search(query, k=len(chunks))}
+    return [
+        {"kind": "pdf", "text": chunk["text"], "score": scores.get(chunk["index"], 0.0), "order": chunk["index"], "item": chunk}
+        for chunk in chunks
+    ]
+
+
+def _shingles(text):
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def pack_snippets(snippets, budget):
+    """Greedily fill a token budget with the most relevant snippets.
+
+    Scores are normalised per kind (BM25 scores of PDF chunks and database
+    ranks of articles are not comparable), then snippets are taken best
+    first. One whose word 5-grams are mostly covered by already packed
+    snippets is skipped as a duplicate; one that does not fit in what is
+    left of the budget is dropped, and smaller ones after it may still fit.
+    Returns (packed snippets in rank order, stats).
+    """
+    best = {}
+    for s in snippets:
+        best[s["kind"]] = max(best.get(s["kind"], 0.0), s["score"])
+
+    def rank(s):
+        normalised = s["score"] / best[s["kind"]] if best[s["kind"]] > 0 else 0.0
+        return -normalised, KIND_PRIORITY.get(s["kind"], len(KIND_PRIORITY)), s["order"]
+
+    packed, seen = [], set()
+    stats = {"budget": budget, "tokens": 0, "dropped_tokens": 0, "packed": 0, "dropped": 0, "duplicates": 0}
+    for s in sorted(snippets, key=rank):
+        shingles = _shingles(s["text"])
+        if shingles and len(shingles & seen) / len(shingles) >= DUPLICATE_THRESHOLD:
+            stats["duplicates"] += 1
+            continue
+        tokens = count_tokens(s["text"])
+        if stats["tokens"] + tokens > budget:
+            stats["dropped"] += 1
+            stats["dropped_tokens"] += tokens
+            continue
+        packed.append(s)
+        seen |= shingles
+        stats["tokens"] += tokens
+        stats["packed"] += 1
+    return packed, stats
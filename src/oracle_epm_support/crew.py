@@ -5,26 +5,168 @@ from langchain_anthropic import ChatAnthropic
 
 
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache, partial
+import contextvars
+import threading
+import time
+import weakref
 
 import yaml
 import os
-from .rag_system import SimpleRAGSystem
+from . import telemetry
+from .context_packer import count_tokens
+from .rag_system import MODULE_KEYWORDS
+from .cancellation import CancelToken, CrewCancelled
 
-# Load Claude model with error handling
+# Models of the "large" and "fast" tiers of the model cascade
+LARGE_MODEL = os.getenv("LARGE_MODEL", "claude-opus-4-20250514")
+FAST_MODEL = os.getenv("FAST_MODEL", "claude-3-5-haiku-20241022")
+
+# Load Claude models with error handling; one client per tier is shared by every agent
 try:
-    claude = ChatAnthropic(model="claude-opus-4-20250514")
+    claude = ChatAnthropic(model=LARGE_MODEL)
 except Exception as e:
     print(f"Failed to initialize Claude model: {e}")
     claude = None
+try:
+    claude_fast = ChatAnthropic(model=FAST_MODEL)
+except Exception as e:
+    print(f"Failed to initialize fast Claude model, using the large one: {e}")
+    claude_fast = None
 
 CONFIG_PATH = Path(__file__).parent / "config"
 
+# Anthropic prompt caching: the end of an agent's first user message (its task with this request's
+# question and packed context) is a cache breakpoint, so the agent's later LLM calls read the system
+# prompt and task from the cache. The system prompt alone is far below the cacheable minimum
+PROMPT_CACHING = os.getenv("ANTHROPIC_PROMPT_CACHING", "true").lower() in ("1", "true", "yes")
+PROMPT_CACHE_POINTS = [{"location": "message", "index": 1}]
+
+# Every module a problem can be routed to
+MODULES = list(MODULE_KEYWORDS.keys())
+
+@lru_cache(maxsize=None)
 def load_yaml(filename):
+    """Parse a config file once; callers must treat the result as read-only"""
     with open(CONFIG_PATH / filename, "r") as f:
         return yaml.safe_load(f)
 
-def create_agents(agent_configs):
-    if claude is None:
+def task_module(task_name):
+    """Module a task belongs to, e.g. 'fccs_support_task' -> 'fccs'"""
+    return task_name.split('_')[0]
+
+# LLM instance id -> (on_event, agent role) for runs whose tokens are being streamed
+_token_streams = {}
+
+def _on_stream_chunk(source, event):
+    target = _token_streams.get(id(source))
+    if target:
+        on_event, role = target
+        on_event({"type": "token", "agent": role, "text": event.chunk})
+
+# LLM instance id -> agent role, for timing each agent's LLM calls
+_llm_roles = {}
+# Start times of the LLM calls in progress on this thread, per LLM instance id
+_llm_calls = threading.local()
+
+def _on_llm_call_started(source, event):
+    if id(source) in _llm_roles:
+        _llm_calls.__dict__.setdefault(id(source), []).append(time.perf_counter())
+
+def _on_llm_call_finished(source, event):
+    started = _llm_calls.__dict__.get(id(source))
+    if started:
+        failed = getattr(event, "type", "") == "llm_call_failed"
+        telemetry.observe(
+            "llm_call", time.perf_counter() - started.pop(), detail=_llm_roles.get(id(source), ""),
+            error="LLMCallFailed" if failed else None
+        )
+
+try:
+    from crewai.utilities.events import (
+        LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+    )
+    crewai_event_bus.on(LLMStreamChunkEvent)(_on_stream_chunk)
+    crewai_event_bus.on(LLMCallStartedEvent)(_on_llm_call_started)
+    crewai_event_bus.on(LLMCallCompletedEvent)(_on_llm_call_finished)
+    crewai_event_bus.on(LLMCallFailedEvent)(_on_llm_call_finished)
+except ImportError:
+    print("Warning: CrewAI event bus unavailable, progress events will not include LLM tokens or call timings")
+
+def describe_step(step):
+    """Short text for an agent step (a tool call or a thought/final answer)"""
+    thought = (getattr(step, "thought", None) or "").strip()
+    tool = getattr(step, "tool", None)
+    if tool:
+        return f"{thought}\n🔧 {tool}: {getattr(step, 'tool_input', '')}".strip()
+    return thought or str(getattr(step, "output", step))[:500]
+
+def _time_agent(agent):
+    """Record each of this agent's LLM calls as an 'llm_call' stage labelled with its role"""
+    llm = getattr(agent, "llm", None)
+    if llm is None:
+        return
+    _llm_roles[id(llm)] = agent.role.strip()
+    weakref.finalize(llm, _llm_roles.pop, id(llm), None)
+
+def min_cacheable_tokens(model):
+    """Shortest prompt prefix Anthropic caches for a model"""
+    return 2048 if "haiku" in model else 1024
+
+def _cache_prompts(agent, task, inputs=None):
+    """Mark an agent's prompt prefix cacheable; LiteLLM adds the cache_control blocks for Claude.
+
+    Prompts shorter than the model's cacheable minimum get no breakpoint:
+    Anthropic would not cache them anyway.
+    """
+    llm = getattr(agent, "llm", None)
+    params = getattr(llm, "additional_params", None)
+    model = str(getattr(llm, "model", ""))
+    if not (PROMPT_CACHING and isinstance(params, dict) and "claude" in model):
+        return
+    prompt = "\n".join([agent.role, agent.goal, agent.backstory, task.description, task.expected_output])
+    if count_tokens(prompt) + sum(count_tokens(str(v)) for v in (inputs or {}).values()) >= min_cacheable_tokens(model):
+        params["cache_control_injection_points"] = PROMPT_CACHE_POINTS
+
+def _on_llm_success(kwargs, response, start_time, end_time):
+    """LiteLLM success callback: count prompt cache reads and writes"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    read = getattr(usage, "_cache_read_input_tokens", 0) or getattr(details, "cached_tokens", 0) or 0
+    written = getattr(usage, "_cache_creation_input_tokens", 0) or 0
+    if read:
+        telemetry.TOKENS.inc(read, stage="llm_call", kind="cache_read")
+    if written:
+        telemetry.TOKENS.inc(written, stage="llm_call", kind="cache_write")
+
+try:
+    import litellm
+    litellm.success_callback.append(_on_llm_success)
+except ImportError:
+    pass
+
+def _stream_agent(agent, on_event):
+    """Turn on token streaming for one agent's LLM and route its chunks to on_event"""
+    llm = getattr(agent, "llm", None)
+    if llm is None or not hasattr(llm, "stream"):
+        return
+    llm.stream = True
+    _token_streams[id(llm)] = (on_event, agent.role.strip())
+    weakref.finalize(llm, _token_streams.pop, id(llm), None)
+
+def llm_for_tier(tier):
+    """Shared model client of a cascade tier ("fast" or "large")"""
+    if tier == "fast" and claude_fast is not None:
+        return claude_fast
+    return claude
+
+def create_agents(agent_configs, step_callback=None, llm=None):
+    """Create agents on `llm` (the large model by default); `step_callback(role, step)` is called after each of their steps"""
+    llm = llm or claude
+    if llm is None:
         print("Warning: Claude model not initialized, using default LLM")
     return [
         Agent(
@@ -33,23 +175,20 @@ def create_agents(agent_configs):
             backstory=cfg["backstory"],
             verbose=True,
             memory=True,
-            llm=claude if claude else None
+            llm=llm,
+            step_callback=partial(step_callback, cfg["role"].strip()) if step_callback else None
         ) for cfg in agent_configs.values()
     ]
 
-def create_tasks(task_configs, agents, rag_system=None):
+def create_tasks(task_configs, agents, contexts=None):
+    """Create tasks, appending each task's per-request RAG context block if given"""
     tasks = []
     for i, (task_name, cfg) in enumerate(task_configs.items()):
-        # Enhance task description with RAG context if available
         description = cfg["description"]
-        if rag_system:
-            # Extract module from task name
-            module = task_name.split('_')[0] if '_' in task_name else None
-            # Get problem from description (assuming it's in the format "Problem: {problem}")
-            problem_text = description.split("Problem: ")[-1] if "Problem: " in description else description
-            context = rag_system.retrieve_relevant_context(problem_text, module)
-            if context:
-                description = rag_system.enhance_prompt_with_context(description, context)
+        context = (contexts or {}).get(task_module(task_name))
+        if context:
+            # Escape braces so CrewAI's {problem} interpolation leaves the context intact
+            description += "\n" + context.replace("{", "{{").replace("}", "}}")
         
         tasks.append(Task(
             description=description,
@@ -58,23 +197,159 @@ def create_tasks(task_configs, agents, rag_system=None):
         ))
     return tasks
 
-def build_crew():
+def build_crew(modules=None, contexts=None, cancel=None, on_event=None, tier="large", inputs=None):
+    """Build a crew holding only the agents/tasks for the given modules (all if None).
+
+    `contexts` maps module -> retrieved context block for this request; each
+    task only receives the block for its own module. A CancelToken in
+    `cancel` stops the crew between agent steps. `on_event(event)` receives
+    progress dicts as the crew runs: each agent step, each finished task
+    (with the seconds it took) and, with streaming LLMs, each token. `tier`
+    picks the model the agents run on. The kickoff `inputs`, if given, count
+    towards the prompt length that decides whether prompts are cached.
+    """
     agents_config = load_yaml("agents.yaml")
     tasks_config = load_yaml("tasks.yaml")
 
-    # Initialize RAG system
-    rag_system = SimpleRAGSystem()
+    # Agents and tasks are paired by position in the YAML files
+    if modules:
+        selected = [i for i, name in enumerate(tasks_config) if task_module(name) in modules]
+        if not selected:
+            raise ValueError(f"No tasks configured for modules: {modules}")
+        agents_config = {k: v for i, (k, v) in enumerate(agents_config.items()) if i in selected}
+        tasks_config = {k: v for i, (k, v) in enumerate(tasks_config.items()) if i in selected}
+
+    def on_step(role, step):
+        if on_event:
+            on_event({"type": "step", "agent": role, "text": describe_step(step)})
+        if cancel:
+            cancel.check()
+
+    # Tasks run one after another, so each one took the time since the previous one finished
+    last_finished = [time.monotonic()]
+
+    def on_task(output):
+        if on_event:
+            now = time.monotonic()
+            on_event({
+                "type": "task",
+                "agent": str(getattr(output, "agent", "")).strip(),
+                "text": str(output),
+                "seconds": round(now - last_finished[0], 3),
+            })
+            last_finished[0] = now
+        if cancel:
+            cancel.check()
 
-    agents = create_agents(agents_config)
-    tasks = create_tasks(tasks_config, agents, rag_system)
+    watched = cancel or on_event
+    agents = create_agents(agents_config, on_step if watched else None, llm_for_tier(tier))
+    tasks = create_tasks(tasks_config, agents, contexts)
+    for agent, task in zip(agents, tasks):
+        _time_agent(agent)
+        _cache_prompts(agent, task, inputs)
+    if on_event:
+        for agent in agents:
+            _stream_agent(agent, on_event)
 
     # Optional: print for debug
     print("🧠 Agents loaded:", [a.role for a in agents])
     print("🛠 Tasks created:", [t.description[:50] for t in tasks])
-    print("📚 RAG system initialized with Oracle EPM knowledge base")
 
     return Crew(
         agents=agents,
         tasks=tasks,
-        process=Process.sequential
-    )
\ No newline at end of file
+        process=Process.sequential,
+        task_callback=on_task if watched else None
+    )
+
+def emit_usage(on_event, modules, output):
+    """Report a finished crew's token usage as a 'usage' event"""
+    usage = getattr(output, "token_usage", None)
+    if on_event and usage is not None:
+        on_event({
+            "type": "usage",
+            "modules": list(modules),
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+            "cached_prompt_tokens": getattr(usage, "cached_prompt_tokens", 0),
+            "completion_tokens": getattr(usage, "completion_tokens", 0),
+            "total_tokens": getattr(usage, "total_tokens", 0),
+            "requests": getattr(usage, "successful_requests", 0),
+        })
+
+def kickoff_crew(modules, inputs, contexts=None, cancel=None, on_event=None, tier="large"):
+    """Build and run one crew as a 'crew' stage carrying its token usage"""
+    with telemetry.span("crew", detail=",".join(modules), tier=tier) as timing:
+        output = build_crew(modules, contexts, cancel, on_event, tier, inputs).kickoff(inputs=inputs)
+        usage = getattr(output, "token_usage", None)
+        if usage is not None:
+            timing.set(
+                tokens_in=getattr(usage, "prompt_tokens", 0),
+                tokens_cached=getattr(usage, "cached_prompt_tokens", 0),
+                tokens_out=getattr(usage, "completion_tokens", 0),
+                llm_requests=getattr(usage, "successful_requests", 0),
+            )
+    emit_usage(on_event, modules, output)
+    return output
+
+def merge_answers(answers, timed_out=(), failed=None):
+    """Combine per-module answers into a single response, one section per module"""
+    failed = failed or {}
+    sections = []
+    for module, answer in answers.items():
+        sections.append(f"### {module.upper()}\n{answer}")
+    for module in timed_out:
+        sections.append(f"### {module.upper()}\n⏰ No answer within the agent deadline.")
+    for module, error in failed.items():
+        sections.append(f"### {module.upper()}\n❌ Agent failed: {error}")
+    return "\n\n".join(sections)
+
+def kickoff_parallel(modules, inputs, timeout=None, contexts=None, cancel=None, on_event=None, tier="large"):
+    """Run one single-agent crew per module concurrently and merge their answers.
+
+    The tasks do not depend on each other's output, so wall-clock time is the
+    slowest agent rather than the sum. Agents still running after `timeout`
+    seconds are reported as timed out, left out of the merge and cancelled
+    through a child of `cancel`, so the caller's token is not marked as
+    cancelled by the user.
+    """
+    cancel = CancelToken(parent=cancel)
+    executor = ThreadPoolExecutor(max_workers=len(modules), thread_name_prefix="crew-fanout")
+    started = time.monotonic()
+    # Each crew runs in a copy of this context so its spans nest under the caller's
+    futures = {
+        executor.submit(contextvars.copy_context().run, kickoff_crew, [m], inputs, contexts, cancel, on_event, tier): m
+        for m in modules
+    }
+    done, not_done = wait(futures, timeout=timeout)
+    # Don't block on stragglers, but stop them from making further LLM calls
+    if not_done:
+        cancel.cancel()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    answers, failed = {}, {}
+    for future in futures:
+        if future not in done:
+            continue
+        module = futures[future]
+        try:
+            answers[module] = str(future.result())
+        except Exception as e:
+            failed[module] = e
+    timed_out = [futures[f] for f in not_done]
+    print(f"🔀 Fan-out over {modules} finished in {time.monotonic() - started:.1f}s "
+          f"({len(answers)} ok, {len(timed_out)} timed out, {len(failed)} failed)")
+
+    if not answers and failed:
+        raise next(iter(failed.values()))
+    if not answers and cancel.cancelled:
+        raise CrewCancelled("Crew run cancelled before any agent answered")
+    return merge_answers(answers, timed_out, failed)
+
+def kickoff_routed(modules, inputs, parallel=True, timeout=None, contexts=None, cancel=None, on_event=None,
+                   tier="large"):
+    """Kick off the crew for the routed modules, fanning out when there are several"""
+    if parallel and len(modules) > 1:
+        return kickoff_parallel(
+            modules, inputs, timeout=timeout, contexts=contexts, cancel=cancel, on_event=on_event, tier=tier
+        )
+    return kickoff_crew(modules, inputs, contexts, cancel, on_event, tier)
@@ -0,0 +1,249 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from . import telemetry
+from .cancellation import CancelToken, CrewCancelled
+
+
+class JobQueueFull(Exception):
+    """Raised when too many crew jobs are already waiting to run"""
+
+
+class CrewJobQueue:
+    """Background crew runs that clients submit and then poll.
+
+    `run(payload, cancel, emit)` does the actual work (routing, retrieval,
+    crew kickoff) and returns the answer text; progress dicts passed to
+    `emit` are buffered per job for streaming to clients. At most `workers` jobs run at once;
+    once `max_pending` jobs are waiting, submit raises JobQueueFull. Each job
+    gets a CancelToken whose deadline starts when the job starts running, so a
+    job past `timeout` or cancelled by the client stops making LLM calls.
+    Job states: queued -> running -> done | failed | cancelled | timed_out.
+
+    Jobs submitted with the `key` of a job that is still queued or running
+    don't start a run of their own (single flight): they attach to that run,
+    share its event stream and get its result. Cancelling one of them only
+    detaches it; the run is cancelled when its last job is.
+    """
+
+    def __init__(self, run, workers=4, max_pending=20, max_jobs=500, timeout=600, max_events=5000):
+        self.run = run
+        self.timeout = timeout
+        self.max_events = max_events
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crew-job")
+        self._jobs = OrderedDict()
+        self._events = {}
+        # Run of each job still queued or running, and the run in flight for each key
+        self._runs = {}
+        self._flights = {}
+        self._queued = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def submit(self, payload, key=None):
+        """Queue a job and return its id; with the `key` of a job in flight, attach to that job's run"""
+        with self._lock:
+            run = self._flights.get(key) if key is not None else None
+            if run is None and self._queued >= self.max_pending:
+                raise JobQueueFull(f"{self._queued} jobs already queued")
+            job_id = self._new_job(coalesced=run is not None)
+            if run is not None:
+                # Same question already in flight: one more receiver of its result instead of another LLM run
+                self.coalesced += 1
+                telemetry.COALESCED_REQUESTS.inc()
+                self._update(job_id, status=run["status"], started_at=run["started_at"])
+                run["jobs"].append(job_id)
+            else:
+                self._queued += 1
+                run = {
+                    "key": key,
+                    "jobs": [job_id],
+                    "cancel": CancelToken(),
+                    "events": [{"type": "status", "status": "queued"}],
+                    "status": "queued",
+                    "started_at": None,
+                }
+                if key is not None:
+                    self._flights[key] = run
+            self._runs[job_id] = run
+            self._events[job_id] = run["events"]
+            self._trim()
+            if run["jobs"][0] != job_id:
+                return job_id
+
+        # The job runs in a copy of the submitter's context, so its spans nest under the request's
+        self._executor.submit(contextvars.copy_context().run, self._run, run, payload)
+        return job_id
+
+    def complete(self, result, events=()):
+        """Record a question answered without a crew run (e.g. from a cache) as a finished job.
+
+        It never waits for a worker or counts towards `max_pending`, but can be
+        fetched and streamed like any other job.
+        """
+        with self._lock:
+            job_id = self._new_job()
+            now = time.time()
+            self._update(job_id, status="done", result=result, started_at=now, finished_at=now)
+            self._events[job_id] = list(events) + [{"type": "status", "status": "done"}]
+            self._trim()
+            return job_id
+
+    def _new_job(self, coalesced=False):
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "error_type": None,
+            "coalesced": coalesced,
+        }
+        return job_id
+
+    def _trim(self):
+        # Forget the oldest finished jobs; live ones are kept until they finish
+        for old_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if old_id not in self._runs:
+                del self._jobs[old_id]
+                del self._events[old_id]
+
+    def _run(self, run, payload):
+        with self._lock:
+            self._queued -= 1
+            if not run["jobs"]:
+                # Every job of this run was cancelled while it was queued
+                return
+            run.update(status="running", started_at=time.time())
+            for job_id in run["jobs"]:
+                self._update(job_id, status="running", started_at=run["started_at"])
+            self._append(run["events"], {"type": "status", "status": "running"})
+            telemetry.observe("queue_wait", run["started_at"] - self._jobs[run["jobs"][0]]["created_at"])
+        cancel = run["cancel"]
+        cancel.start(self.timeout)
+        result, error = None, None
+        try:
+            with telemetry.span("crew_job"):
+                result = self.run(payload, cancel, partial(self._emit, run))
+            status = "done"
+        except CrewCancelled as e:
+            error = e
+            status = "cancelled" if cancel.cancel_requested else "timed_out"
+        except Exception as e:
+            error = e
+            status = "failed"
+        with self._lock:
+            run["status"] = status
+            self._land(run)
+            for job_id in run["jobs"]:
+                self._update(
+                    job_id, status=status, result=result, finished_at=time.time(),
+                    error=str(error) if error else None,
+                    error_type=type(error).__name__ if error else None
+                )
+                self._runs.pop(job_id, None)
+            self._append(run["events"], {"type": "status", "status": status})
+            self._finished.notify_all()
+            job_ids = list(run["jobs"])
+        if job_ids:
+            shared = f" (shared by {len(job_ids)} requests)" if len(job_ids) > 1 else ""
+            print(f"🧾 Job {job_ids[0][:8]} {status}{shared}")
+
+    def _land(self, run):
+        # Later submissions with this key start a run of their own
+        if run["key"] is not None and self._flights.get(run["key"]) is run:
+            del self._flights[run["key"]]
+
+    def _emit(self, run, event):
+        with self._lock:
+            self._append(run["events"], event)
+
+    def _append(self, events, event):
+        # Past the cap, drop token events but keep steps and status changes
+        if len(events) < self.max_events or event["type"] != "token":
+            events.append(event)
+            self._finished.notify_all()
+
+    def events(self, job_id, start=0, timeout=15):
+        """Events of a job from index `start`, waiting up to `timeout` seconds for new ones.
+
+        Returns (events, job); job is None for an unknown job. An empty list
+        with a finished job means the stream is complete.
+        """
+        with self._finished:
+            self._finished.wait_for(
+                lambda: len(self._events.get(job_id, ())) > start or job_id not in self._runs,
+                timeout=timeout
+            )
+            job = self._jobs.get(job_id)
+            return list(self._events.get(job_id, ())[start:]), dict(job) if job else None
+
+    def _update(self, job_id, **fields):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it already finished or is unknown.
+
+        A job sharing its run with others is detached and cancelled at once;
+        the run itself keeps going for them.
+        """
+        with self._lock:
+            run = self._runs.get(job_id)
+            if run is None or job_id not in self._jobs:
+                return False
+            if len(run["jobs"]) > 1:
+                run["jobs"].remove(job_id)
+                self._runs.pop(job_id)
+                self._update(job_id, status="cancelled", finished_at=time.time())
+                # The detached job keeps what it has seen so far of the shared stream
+                self._events[job_id] = run["events"] + [{"type": "status", "status": "cancelled"}]
+                self._finished.notify_all()
+                return True
+            run["cancel"].cancel()
+            self._land(run)
+            if run["status"] == "queued":
+                # The worker finds the run empty and skips it when it is dequeued
+                run["jobs"].remove(job_id)
+                self._runs.pop(job_id)
+                self._update(job_id, status="cancelled", finished_at=time.time())
+                self._append(run["events"], {"type": "status", "status": "cancelled"})
+                self._finished.notify_all()
+            return True
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or `timeout` passes, then return it"""
+        with self._finished:
+            self._finished.wait_for(lambda: job_id not in self._runs, timeout=timeout)
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+            return {
+                "queued": self._queued,
+                "running": statuses.count("running"),
+                "max_pending": self.max_pending,
+                "jobs": len(statuses),
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,71 @@
+import threading
+from contextlib import contextmanager
+
+from .crew import kickoff_routed
+
+
+class PoolExhausted(Exception):
+    """Raised when no crew slot frees up within the wait timeout"""
+
+
+class CrewPool:
+    """Bounded pool of crew slots for concurrent web requests.
+
+    Every request gets its own freshly built crew, so agent memory never leaks
+    between users. Building one is cheap: the YAML config is parsed once and
+    all agents share one ChatAnthropic client. The pool only caps how many run
+    at once. Callers past the cap wait up to `wait_timeout` seconds, then get
+    PoolExhausted.
+    """
+
+    def __init__(self, size=4, wait_timeout=30):
+        self.size = size
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self, wait_timeout=None):
+        """Hold one crew slot for the duration of the block"""
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=wait_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_use += 1
+        if not acquired:
+            raise PoolExhausted(f"All {self.size} crew slots busy for {wait_timeout}s")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                self.served += 1
+            self._slots.release()
+
+    def kickoff(self, modules, inputs, parallel=True, timeout=None, wait_timeout=None, contexts=None,
+                cancel=None, on_event=None, tier="large"):
+        """Run a fresh crew for the routed modules once a slot is free"""
+        with self.slot(wait_timeout):
+            return kickoff_routed(
+                modules, inputs, parallel=parallel, timeout=timeout, contexts=contexts,
+                cancel=cancel, on_event=on_event, tier=tier
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "served": self.served,
+                "rejected": self.rejected,
+            }
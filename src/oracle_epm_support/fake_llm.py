@@ -0,0 +1,55 @@
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+from crewai.llms.base_llm import BaseLLM
+
+
+class FakeLLM(BaseLLM):
+    """Deterministic offline stand-in for Claude, for benchmarks.
+
+    Every call sleeps `delay` seconds and returns a final answer of
+    `completion_tokens` words derived from the prompt, so runs are repeatable
+    and need no network or API key. Token usage is reported through the
+    callbacks CrewAI passes in, so crew token counts work as with a real model.
+    `calls` counts the calls of this model and every copy made with spawn().
+    """
+
+    def __init__(self, delay=0.05, completion_tokens=200, _counter=None):
+        super().__init__(model="fake-claude")
+        self.delay = delay
+        self.completion_tokens = completion_tokens
+        self._counter = _counter or {"calls": 0, "lock": threading.Lock()}
+
+    @property
+    def calls(self):
+        return self._counter["calls"]
+
+    def spawn(self):
+        """A separate model instance with the same settings, sharing this one's call count"""
+        return FakeLLM(self.delay, self.completion_tokens, self._counter)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        prompt = "\n".join(m["content"] for m in messages)
+        time.sleep(self.delay)
+        with self._counter["lock"]:
+            self._counter["calls"] += 1
+
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = [seed[i % 56:i % 56 + 8] for i in range(self.completion_tokens)]
+        usage = SimpleNamespace(
+            prompt_tokens=len(prompt.split()), completion_tokens=self.completion_tokens, prompt_tokens_details=None
+        )
+        for callback in callbacks or []:
+            if hasattr(callback, "log_success_event"):
+                callback.log_success_event(kwargs={}, response_obj={"usage": usage}, start_time=0, end_time=0)
+        return "Thought: I now know the final answer\nFinal Answer: " + " ".join(words)
+
+    def supports_function_calling(self):
+        return False
+
+    def get_context_window_size(self):
+        return 200000
@@ -0,0 +1,50 @@
+import re
+
+# Cheapest first: curated knowledge base lookup, small fast model, large model
+TIERS = ("kb", "fast", "large")
+
+# Lines that look like Groovy (or other script) code rather than prose
+CODE_LINE_RE = re.compile(
+    r"^\s*(def\s|import\s|if\s*\(|for\s*\(|return\b|[{}]|\w[\w.]*\s*[+\-*/]?=[^=]|.*;\s*$|.*operation\.grid)"
+)
+
+
+def script_chars(text):
+    """Characters of a text that are on code-like lines"""
+    return sum(len(line) for line in (text or "").splitlines() if CODE_LINE_RE.match(line))
+
+
+class TierPolicy:
+    """Picks the cheapest model tier that should answer a prepared request.
+
+    Short questions about known error codes are answered from the curated
+    knowledge base without an LLM call ("kb"). Everything else goes to the
+    small model ("fast") unless it needs the large one ("large"): the user
+    asked for it, the request carries more than `script_chars` characters of
+    Groovy/script code, or retrieval confidence is low (no module keyword
+    matched, or a routed module found fewer than `min_articles` articles or
+    none scoring at least `min_score`). `choose` returns (tier, reason).
+    """
+
+    def __init__(self, enabled=True, kb_max_words=25, script_chars=1500, min_articles=1, min_score=0.0):
+        self.enabled = enabled
+        self.kb_max_words = kb_max_words
+        self.script_chars = script_chars
+        self.min_articles = min_articles
+        self.min_score = min_score
+
+    def choose(self, problem, pdf_text="", module_results=None, routed_all=False, error_codes=None, escalate=False):
+        if not self.enabled:
+            return "large", "tiering_off"
+        if escalate:
+            return "large", "user_request"
+        if script_chars(problem) + script_chars(pdf_text) > self.script_chars:
+            return "large", "long_script"
+        if error_codes and not pdf_text and len(problem.split()) <= self.kb_max_words:
+            return "kb", "known_error_code"
+        if routed_all:
+            return "large", "no_module_match"
+        for results in (module_results or {}).values():
+            if len(results) < self.min_articles or (results and max(r['score'] for r in results) < self.min_score):
+                return "large", "low_retrieval_confidence"
+        return "fast", "confident_retrieval"
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from . import telemetry
+from .chunking import chunk_pages, extract_keywords
+
+# Defaults for the per-upload limits that keep memory bounded
+MAX_PDF_BYTES = 50 * 1024 * 1024
+MAX_PDF_PAGES = 1000
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+class PDFLimitExceeded(ValueError):
+    """Raised when an upload is over the configured byte or page limit"""
+
+
+def spool_upload(stream, max_bytes=MAX_PDF_BYTES):
+    """Copy an upload stream to a temp file block by block.
+
+    Only one block is in memory at a time. Aborts once `max_bytes` is exceeded.
+    Returns (path, sha256 hex digest of the content). The caller owns (and
+    must remove) the returned file.
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="epm_pdf_")
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = stream.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                digest.update(block)
+                if size > max_bytes:
+                    raise PDFLimitExceeded(f"PDF is larger than the {max_bytes / (1024 * 1024):g} MB limit")
+                out.write(block)
+        if size == 0:
+            raise ValueError("PDF file is empty")
+        return path, digest.hexdigest()
+    except Exception:
+        os.remove(path)
+        raise
+
+
+class ExtractionCache:
+    """On-disk cache of extracted PDF pages keyed by the file's SHA-256.
+
+    Entries are JSONL files of [page_number, text]. They are written as pages
+    stream past, so caching doesn't hold a whole document in memory, and are
+    published with an atomic rename, which makes the cache safe to share
+    between worker processes. Reads bump the entry's mtime, and the least
+    recently used entries are evicted once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, content_hash):
+        return os.path.join(self.directory, f"{content_hash}.jsonl")
+
+    def get(self, content_hash):
+        """Iterator over cached (page_number, text) pairs, or None on a miss"""
+        path = self._path(content_hash)
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        def pages():
+            with f:
+                for line in f:
+                    page_no, text = json.loads(line)
+                    yield page_no, text
+        return pages()
+
+    def record(self, content_hash, pages):
+        """Pass pages through unchanged while writing them to the cache"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        completed = False
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as out:
+                for page in pages:
+                    out.write(json.dumps(page) + "\n")
+                    yield page
+            os.replace(tmp_path, self._path(content_hash))
+            completed = True
+            self._evict()
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        # Several processes may evict at once; entries that vanish underneath are skipped
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".jsonl"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def iter_pdf_pages(path, max_pages=MAX_PDF_PAGES):
+    """Yield (page_number, text) for each page with text, parsing one page at a time.
+
+    The reader is given the open file, not the path (for a path PyPDF2 copies
+    the whole file into memory), and seeks to each object as a page needs it.
+    Objects it has parsed stay cached on the reader until the file is done, but
+    the raw file is never loaded whole and only the current page's text is kept.
+    """
+    # Imported here so the web app starts without loading PyPDF2
+    import PyPDF2
+
+    try:
+        with open(path, "rb") as pdf_file:
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+
+            # Check if PDF is encrypted
+            if pdf_reader.is_encrypted:
+                raise ValueError("PDF is password protected and cannot be read")
+
+            # Check number of pages
+            num_pages = len(pdf_reader.pages)
+            if num_pages == 0:
+                raise ValueError("PDF contains no pages")
+            if num_pages > max_pages:
+                raise PDFLimitExceeded(f"PDF has {num_pages} pages; the limit is {max_pages}")
+
+            pages_with_text = 0
+
+            for page_num in range(num_pages):
+                try:
+                    page_text = pdf_reader.pages[page_num].extract_text()
+                except Exception as page_error:
+                    print(f"Warning: Could not extract text from page {page_num + 1}: {page_error}")
+                    continue
+                if page_text and page_text.strip():
+                    pages_with_text += 1
+                    yield page_num + 1, page_text
+
+            if pages_with_text == 0:
+                raise ValueError(f"No readable text found in any of the {num_pages} pages. PDF may contain only images or scanned content.")
+
+    except Exception as e:
+        raise Exception(f"PDF processing failed: {str(e)}") from e
+
+
+def pdf_page_count(path):
+    """Number of pages in a PDF, including pages without text; reads only the page tree"""
+    import PyPDF2
+
+    with open(path, "rb") as pdf_file:
+        return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+def cached_pdf_pages(path, content_hash=None, cache=None, max_pages=MAX_PDF_PAGES):
+    """Pages of a spooled PDF, from the extraction cache when this content was seen before.
+
+    Returns (pages, cache_hit); cache_hit is None when no cache is used.
+    """
+    if cache is None or content_hash is None:
+        return iter_pdf_pages(path, max_pages), None
+    cached = cache.get(content_hash)
+    if cached is not None:
+        return cached, True
+    return cache.record(content_hash, iter_pdf_pages(path, max_pages)), False
+
+
+def extract_text_from_pdf(pdf_file, max_bytes=MAX_PDF_BYTES, max_pages=MAX_PDF_PAGES, cache=None):
+    """Extract text content from an uploaded PDF file, with [Page N] markers"""
+    path, content_hash = spool_upload(pdf_file, max_bytes)
+    try:
+        pages, cache_hit = cached_pdf_pages(path, content_hash, cache, max_pages)
+        if cache_hit is not None:
+            telemetry.record_cache("pdf_text", cache_hit)
+        return "\n\n".join(f"[Page {page_no}]\n{text}" for page_no, text in pages).strip()
+    finally:
+        os.remove(path)
+
+
+def process_pdf(path, chunk_size=1500, overlap=200, max_pages=MAX_PDF_PAGES, content_hash=None, cache=None):
+    """Parse a spooled PDF into keyworded chunks.
+
+    Pages stream straight into the chunker, so the full text is never built.
+    This is the CPU-bound half of ingestion and runs in a worker process;
+    storing the chunks happens back in the web process, which also records
+    the returned `seconds` and `cache_hit` (metrics here would stay in this
+    process). `page_count` is the document's page count; `pages_with_text`
+    counts only the pages that yielded text.
+    """
+    started = time.perf_counter()
+    pages_with_text = 0
+
+    def counted(pages):
+        nonlocal pages_with_text
+        for page in pages:
+            pages_with_text += 1
+            yield page
+
+    pages, cache_hit = cached_pdf_pages(path, content_hash, cache, max_pages)
+    chunks = list(chunk_pages(counted(pages), chunk_size=chunk_size, overlap=overlap))
+    for chunk in chunks:
+        chunk["keywords"] = extract_keywords(chunk["text"])
+    return {
+        "page_count": pdf_page_count(path),
+        "pages_with_text": pages_with_text,
+        "chunks": chunks,
+        "seconds": time.perf_counter() - started,
+        "cache_hit": cache_hit,
+    }
@@ -4,6 +4,24 @@ from pathlib import Path
 import yaml
 from typing import List, Dict, Any
 import json
+import re
+
+# Keyword table used to route a problem to the EPM module(s) it is about.
+# The first keyword of each entry is the module name itself and weighs more;
+# spaces in keywords also match run-together spellings ("free form" ~ "freeform").
+MODULE_KEYWORDS = {
+    "fccs": ["fccs", "consolidation", "close", "intercompany", "elimination", "currency translation", "journal"],
+    "epbcs": ["epbcs", "planning", "budget", "capex", "financials", "projects", "business rule", "data form", "approval"],
+    "essbase": ["essbase", "cube", "calculation", "calc script", "outline", "aso", "bso"],
+    "workforce": ["workforce", "employee", "headcount", "salary", "merit", "benefits"],
+    "freeform": ["free form"],
+    "groovy": ["groovy", "script", "operation.grid", "def"],
+}
+
+_MODULE_PATTERNS = {
+    module: [re.compile(r"\b" + re.escape(keyword).replace(r"\ ", r"\s*") + r"\b") for keyword in keywords]
+    for module, keywords in MODULE_KEYWORDS.items()
+}
 
 class SimpleRAGSystem:
     """Simple RAG system for Oracle EPM knowledge retrieval"""
@@ -85,6 +103,22 @@ class SimpleRAGSystem:
             }
         }
     
+    def detect_modules(self, query: str, top_k: int = 1) -> List[str]:
+        """Rank EPM modules by keyword hits in the query and return the top_k matches"""
+        query_lower = query.lower()
+        scores = {}
+        for module, patterns in _MODULE_PATTERNS.items():
+            score = 0
+            for i, pattern in enumerate(patterns):
+                if pattern.search(query_lower):
+                    score += 3 if i == 0 else 1
+            if score:
+                scores[module] = score
+        
+        # Stable sort keeps MODULE_KEYWORDS order as the tie-breaker
+        ranked = sorted(scores, key=lambda m: scores[m], reverse=True)
+        return ranked[:top_k]
+    
     def retrieve_relevant_context(self, query: str, module: str = None) -> List[str]:
         """Retrieve relevant context based on query and module"""
         relevant_info = []
@@ -92,16 +126,8 @@ class SimpleRAGSystem:
         
         # Determine module if not specified
         if not module:
-            if any(word in query_lower for word in ['fccs', 'consolidation', 'close']):
-                module = 'fccs'
-            elif any(word in query_lower for word in ['epbcs', 'planning', 'budget']):
-                module = 'epbcs'
-            elif any(word in query_lower for word in ['essbase', 'cube', 'calculation']):
-                module = 'essbase'
-            elif any(word in query_lower for word in ['workforce', 'employee', 'headcount']):
-                module = 'workforce'
-            elif any(word in query_lower for word in ['freeform', 'free form']):
-                module = 'freeform'
+            detected = self.detect_modules(query, top_k=1)
+            module = detected[0] if detected else None
         
         # Retrieve module-specific context
         if module and module in self.knowledge_base:
@@ -114,7 +140,7 @@ class SimpleRAGSystem:
                         relevant_info.extend([f"{category.upper()}: {item}" for item in items])
                 elif isinstance(items, dict):
                     for key, value in items.items():
-                        if key in query_lower:
+                        if key.lower() in query_lower:
                             relevant_info.append(f"ERROR {key}: {value}")
         
         # Add general troubleshooting steps
@@ -128,6 +154,18 @@ class SimpleRAGSystem:
         
         return relevant_info[:5]  # Limit to top 5 most relevant items
     
+    def lookup_error_codes(self, query: str) -> Dict[str, str]:
+        """Known error codes mentioned in the query, from any module, with their meaning"""
+        query_lower = query.lower()
+        found = {}
+        for module_kb in self.knowledge_base.values():
+            for items in module_kb.values():
+                if isinstance(items, dict):
+                    for code, meaning in items.items():
+                        if code.lower() in query_lower:
+                            found[code] = meaning
+        return found
+    
     def enhance_prompt_with_context(self, original_prompt: str, context: List[str]) -> str:
         """Enhance the original prompt with retrieved context"""
         if not context:
@@ -143,3 +181,13 @@ RELEVANT KNOWLEDGE BASE CONTEXT:
 Please use this context information when providing your response to ensure accuracy and completeness."""
         
         return enhanced_prompt
+
+def route_problem(problem, top_k=1, rag_system=None):
+    """Pick the top_k modules relevant to a problem.
+
+    Falls back to every module when no module keyword is found, so vague
+    questions still get the full panel of experts.
+    """
+    rag_system = rag_system or SimpleRAGSystem()
+    modules = rag_system.detect_modules(problem, top_k=top_k)
+    return modules or list(MODULE_KEYWORDS)
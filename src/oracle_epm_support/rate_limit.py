@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+
+class AsyncTokenBucket:
+    """Token-bucket rate limiter for asyncio tasks.
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so short
+    bursts go through immediately while the long-run rate stays capped.
+    `acquire()` waits only as long as needed for the next token.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
@@ -0,0 +1,316 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .search_index import tokenize
+
+
+def normalize_problem(text):
+    """Case, punctuation, whitespace and stopword-insensitive form of a question"""
+    return " ".join(tokenize(text))
+
+
+def article_key(doc):
+    """Stable id of a retrieved article: its article_id for database rows, else its id"""
+    return doc.get("article_id", doc["id"])
+
+
+def article_version(doc):
+    """Version of a retrieved article: its updated_at, or a content hash when it has none"""
+    if doc.get("updated_at"):
+        return str(doc["updated_at"])
+    return hashlib.sha256(doc.get("content", "").encode("utf-8")).hexdigest()[:16]
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry and an article -> keys index"""
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._deps = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.time():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, article_ids, ttl):
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (time.time() + ttl, value, article_ids)
+            for article_id in article_ids:
+                self._deps.setdefault(article_id, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            for article_id in entry[2]:
+                keys = self._deps.get(article_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._deps[article_id]
+
+    def invalidate(self, article_ids):
+        with self._lock:
+            keys = set().union(*(self._deps.get(a, ()) for a in article_ids))
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._deps.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """On-disk store in a SQLite file, shared by every process on the host.
+
+    LRU is approximated with a last_used column; the oldest entries are
+    trimmed whenever a write pushes the table past `maxsize`.
+    """
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used);
+                CREATE TABLE IF NOT EXISTS response_cache_deps (
+                    article_id TEXT NOT NULL,
+                    key TEXT NOT NULL REFERENCES response_cache (key) ON DELETE CASCADE,
+                    PRIMARY KEY (article_id, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_response_cache_deps_key ON response_cache_deps (key);
+            """)
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT value FROM response_cache WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, article_ids, ttl):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO response_cache_deps (article_id, key) VALUES (?, ?)",
+                [(article_id, key) for article_id in article_ids]
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            conn.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.maxsize,))
+
+    def invalidate(self, article_ids):
+        with self._conn() as conn:
+            marks = ",".join("?" * len(article_ids))
+            cur = conn.execute(f"""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache_deps WHERE article_id IN ({marks})
+                )
+            """, list(article_ids))
+            return cur.rowcount
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class PostgresBackend:
+    """Store in the knowledge base database, shared by every app instance.
+
+    `get_connection` is a pooled connection context manager such as
+    RAGKnowledgeManager.get_connection.
+    """
+
+    def __init__(self, get_connection, maxsize=10000):
+        self.get_connection = get_connection
+        self.maxsize = maxsize
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS response_cache (
+                        key VARCHAR(64) PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        article_ids TEXT[] NOT NULL,
+                        expires_at TIMESTAMP NOT NULL,
+                        last_used TIMESTAMP NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_response_cache_articles
+                    ON response_cache USING GIN(article_ids)
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_response_cache_last_used
+                    ON response_cache (last_used)
+                """)
+                conn.commit()
+
+    def get(self, key):
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE response_cache SET last_used = NOW()
+                    WHERE key = %s AND expires_at >= NOW()
+                    RETURNING value
+                """, (key,))
+                row = cur.fetchone()
+                conn.commit()
+                return row[0] if row else None
+
+    def set(self, key, value, article_ids, ttl):
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO response_cache (key, value, article_ids, expires_at, last_used)
+                    VALUES (%s, %s, %s, NOW() + %s * INTERVAL '1 second', NOW())
+                    ON CONFLICT (key) DO UPDATE SET
+                        value = EXCLUDED.value,
+                        article_ids = EXCLUDED.article_ids,
+                        expires_at = EXCLUDED.expires_at,
+                        last_used = EXCLUDED.last_used
+                """, (key, value, list(article_ids), ttl))
+                cur.execute("DELETE FROM response_cache WHERE expires_at < NOW()")
+                cur.execute("""
+                    DELETE FROM response_cache WHERE key IN (
+                        SELECT key FROM response_cache ORDER BY last_used DESC OFFSET %s
+                    )
+                """, (self.maxsize,))
+                conn.commit()
+
+    def invalidate(self, article_ids):
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM response_cache WHERE article_ids && %s", (list(article_ids),))
+                deleted = cur.rowcount
+                conn.commit()
+                return deleted
+
+    def clear(self):
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM response_cache")
+                conn.commit()
+
+    def __len__(self):
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM response_cache")
+                return cur.fetchone()[0]
+
+
+class ResponseCache:
+    """Final-answer cache in front of crew kickoff.
+
+    The key is the normalized question, the routed modules, the IDs and
+    versions of the articles retrieved for it and any extra input (such as an
+    uploaded PDF). Editing or deleting one of those articles drops every
+    answer built from it. Storage is pluggable: MemoryBackend, SQLiteBackend
+    or PostgresBackend.
+    """
+
+    def __init__(self, backend, ttl=86400):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, problem, modules, articles, extra=""):
+        payload = json.dumps({
+            "problem": normalize_problem(problem),
+            "modules": sorted(modules),
+            "articles": sorted((article_key(doc), article_version(doc)) for doc in articles),
+            "extra": hashlib.sha256(extra.encode("utf-8")).hexdigest() if extra else "",
+        })
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, articles):
+        self.backend.set(key, value, [article_key(doc) for doc in articles], self.ttl)
+
+    def invalidate(self, article_ids):
+        """Drop cached answers that used any of these articles"""
+        if article_ids:
+            dropped = self.backend.invalidate(list(article_ids))
+            if dropped:
+                print(f"🧹 Response cache: dropped {dropped} answers for changed articles")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {"entries": len(self.backend), "hits": self.hits, "misses": self.misses}
+
+
+def make_response_cache(backend="memory", ttl=86400, maxsize=1000, path=None, get_connection=None):
+    """ResponseCache for a RESPONSE_CACHE_BACKEND name, or None when disabled"""
+    if backend == "off":
+        return None
+    if backend == "sqlite":
+        return ResponseCache(SQLiteBackend(path, maxsize), ttl)
+    if backend == "postgres":
+        if get_connection is not None:
+            return ResponseCache(PostgresBackend(get_connection, maxsize), ttl)
+        print("Warning: postgres response cache needs the database, using in-process cache")
+    return ResponseCache(MemoryBackend(maxsize), ttl)
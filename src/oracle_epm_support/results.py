@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+import threading
+import time
+
+
+class ResultsWriter:
+    """Append-only JSONL writer for batch run results.
+
+    The file is opened once. Every row is flushed to the OS as it is written,
+    and fsync runs every `fsync_every` rows or `fsync_interval` seconds,
+    whichever comes first, so a crash loses at most that much. Safe to call
+    from several threads.
+    """
+
+    def __init__(self, path, fsync_every=20, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, row):
+        line = json.dumps(row, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_results(path):
+    """Rows of a results file; a torn last line from a crash is skipped"""
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Warning: skipping incomplete line in {path}")
+    return rows
+
+
+def _flat(value):
+    # Nested values (agent timings, token counts, id lists) become JSON text in flat formats
+    return json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list)) else value
+
+
+def export_csv(rows, path, fields=None):
+    fields = fields or list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: _flat(value) for key, value in row.items()})
+
+
+def export_parquet(rows, path):
+    """Write rows to Parquet; needs pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow); use a .csv path instead")
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.table({key: [_flat(row.get(key)) for row in rows] for key in fields})
+    pq.write_table(table, path)
+
+
+def export_results(rows, path):
+    """Export to CSV or Parquet depending on the file extension"""
+    if str(path).endswith(".parquet"):
+        export_parquet(rows, path)
+    else:
+        export_csv(rows, path)
@@ -0,0 +1,110 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i in into is it its my
+no not of on or our so that the their then there these this to was we what
+when where which why will with you your
+""".split())
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index with BM25 scoring.
+
+    Each document is indexed from several fields whose term frequencies are
+    weighted (title counts more than keywords, keywords more than content)
+    before BM25 saturation is applied. Postings map token -> {doc_id: tf}, so a
+    query only touches documents that share at least one term with it.
+    Documents can be added or removed at any time without a full rebuild.
+    """
+
+    FIELD_WEIGHTS = {"title": 3.0, "keywords": 2.0, "content": 1.0}
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_lengths = {}
+        self.docs = {}
+        self.total_length = 0.0
+        self._lock = threading.RLock()
+
+    def _term_frequencies(self, doc):
+        tf = Counter()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            value = doc.get(field) or ""
+            if isinstance(value, (list, tuple)):
+                value = " ".join(value)
+            for token in tokenize(value):
+                tf[token] += weight
+        return tf
+
+    def add(self, doc_id, doc, **extra):
+        """Index (or re-index) a document; `extra` is stored alongside it and returned by search"""
+        with self._lock:
+            if doc_id in self.docs:
+                self.remove(doc_id)
+            tf = self._term_frequencies(doc)
+            for token, freq in tf.items():
+                self.postings[token][doc_id] = freq
+            length = sum(tf.values())
+            self.doc_lengths[doc_id] = length
+            self.total_length += length
+            self.docs[doc_id] = dict(extra, doc=doc)
+
+    def add_many(self, items):
+        """Index (doc_id, doc, extra) triples"""
+        for doc_id, doc, extra in items:
+            self.add(doc_id, doc, **extra)
+
+    def remove(self, doc_id):
+        with self._lock:
+            if doc_id not in self.docs:
+                return
+            for token in self._term_frequencies(self.docs[doc_id]["doc"]):
+                postings = self.postings.get(token)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self.postings[token]
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            del self.docs[doc_id]
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query, k=3, predicate=None):
+        """Top-k documents for the query as (score, doc_id, entry) tuples, best first.
+
+        `predicate(entry)` can exclude documents, e.g. to filter by module.
+        """
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores = defaultdict(float)
+            for token in set(tokenize(query)):
+                postings = self.postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            candidates = (
+                (score, doc_id, self.docs[doc_id])
+                for doc_id, score in scores.items()
+                if predicate is None or predicate(self.docs[doc_id])
+            )
+            return heapq.nlargest(k, candidates, key=lambda c: c[0])
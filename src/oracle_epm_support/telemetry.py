@@ -0,0 +1,249 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Request stages range from sub-millisecond cache lookups to multi-minute crew runs
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Histogram:
+    """Prometheus histogram; one series per combination of label values"""
+
+    def __init__(self, name, help, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((key, dict(series, buckets=list(series["buckets"]))) for key, series in self._series.items())
+        le_names = self.labelnames + ("le",)
+        for key, series in snapshot:
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_labels(le_names, key + (f'{bound:g}',))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(le_names, key + ('+Inf',))} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter; one series per combination of label values"""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for key, value in snapshot:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    """Prometheus gauge; one series per combination of label values, set to the latest reading"""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._series[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for key, value in snapshot:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "epm_stage_seconds", "Time spent in each request stage", ("stage", "detail")
+)
+TOKENS = Counter(
+    "epm_llm_tokens_total", "LLM tokens by stage and kind (prompt, cached_prompt, completion)", ("stage", "kind")
+)
+CACHE_LOOKUPS = Counter(
+    "epm_cache_lookups_total", "Cache lookups by cache and result (hit, miss)", ("cache", "result")
+)
+CONTEXT_TOKENS = Counter(
+    "epm_context_tokens_total", "Context tokens per agent prompt, packed or dropped to fit the budget", ("result",)
+)
+TIER_REQUESTS = Counter(
+    "epm_tier_requests_total", "Requests by the model tier chosen to answer them, and why", ("tier", "reason")
+)
+COALESCED_REQUESTS = Counter(
+    "epm_coalesced_requests_total", "Requests that attached to an identical in-flight crew run instead of starting one"
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "epm_db_pool_connections", "Database pool connections by state (in_use, idle)", ("state",)
+)
+DB_POOL_WAIT_SECONDS = Gauge(
+    "epm_db_pool_wait_seconds", "Total time spent waiting to check out a database connection since startup"
+)
+DB_POOL_TIMEOUTS = Gauge(
+    "epm_db_pool_timeouts", "Database connection checkouts that timed out since startup"
+)
+METRICS = [
+    STAGE_SECONDS, TOKENS, CACHE_LOOKUPS, CONTEXT_TOKENS, TIER_REQUESTS, COALESCED_REQUESTS,
+    DB_POOL_CONNECTIONS, DB_POOL_WAIT_SECONDS, DB_POOL_TIMEOUTS,
+]
+
+# Span attributes that are also counted as tokens
+TOKEN_ATTRIBUTES = {"tokens_in": "prompt", "tokens_cached": "cached_prompt", "tokens_out": "completion"}
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+class Span:
+    """One timed stage of a request; attributes set on it end up on the metrics and the trace"""
+
+    def __init__(self, stage, detail="", attributes=None):
+        self.stage = stage
+        self.detail = detail
+        self.attributes = dict(attributes or {})
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+_current = contextvars.ContextVar("epm_span", default=None)
+_tracer = None
+
+
+def current_span():
+    """The innermost open span in this context, or None"""
+    return _current.get()
+
+
+def _record(current, seconds):
+    STAGE_SECONDS.observe(seconds, stage=current.stage, detail=current.detail)
+    for attribute, kind in TOKEN_ATTRIBUTES.items():
+        if current.attributes.get(attribute):
+            TOKENS.inc(current.attributes[attribute], stage=current.stage, kind=kind)
+
+
+def _otel_attributes(current):
+    attributes = {"epm.stage": current.stage, "epm.detail": current.detail}
+    for key, value in current.attributes.items():
+        if value is not None:
+            attributes[f"epm.{key}"] = value if isinstance(value, (bool, int, float, str)) else str(value)
+    return attributes
+
+
+@contextmanager
+def span(stage, detail="", **attributes):
+    """Time a block as one request stage.
+
+    The duration goes into the `epm_stage_seconds` histogram under
+    (stage, detail); token attributes are added to `epm_llm_tokens_total`.
+    With tracing configured the block is also an OpenTelemetry span, nested
+    under whatever span is open in this context.
+    """
+    current = Span(stage, detail, attributes)
+    token = _current.set(current)
+    started = time.perf_counter()
+    with (_tracer.start_as_current_span(f"epm.{stage}") if _tracer else nullcontext()) as otel_span:
+        try:
+            yield current
+        except BaseException as e:
+            current.set(error=type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+            _record(current, time.perf_counter() - started)
+            if otel_span is not None:
+                otel_span.set_attributes(_otel_attributes(current))
+
+
+def observe(stage, seconds, detail="", **attributes):
+    """Record a stage that was timed elsewhere (e.g. in a worker process) as if it had just ended"""
+    current = Span(stage, detail, attributes)
+    _record(current, seconds)
+    if _tracer:
+        end = time.time_ns()
+        otel_span = _tracer.start_span(f"epm.{stage}", start_time=end - int(seconds * 1e9))
+        otel_span.set_attributes(_otel_attributes(current))
+        otel_span.end(end_time=end)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup and mark the open span as a hit or miss"""
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+    current = _current.get()
+    if current is not None:
+        current.set(cache_hit=bool(hit))
+
+
+def record_pool(stats):
+    """Set the database pool gauges from a ConnectionPool.stats() reading"""
+    DB_POOL_CONNECTIONS.set(stats["in_use"], state="in_use")
+    DB_POOL_CONNECTIONS.set(stats["idle"], state="idle")
+    DB_POOL_WAIT_SECONDS.set(stats["wait_seconds"])
+    DB_POOL_TIMEOUTS.set(stats["timeouts"])
+
+
+def configure_tracing(path, service_name="oracle-epm-support"):
+    """Also export every span to `path` as OpenTelemetry JSON, one span per line.
+
+    Needs opentelemetry-sdk. Uses its own tracer provider, so the global one
+    (which CrewAI sets up for its own telemetry) is left alone.
+    """
+    global _tracer
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        raise ImportError("OpenTelemetry tracing needs opentelemetry-sdk (pip install opentelemetry-sdk)")
+
+    out = open(path, "a", encoding="utf-8")
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(
+        ConsoleSpanExporter(out=out, formatter=lambda s: s.to_json(indent=None) + "\n")
+    ))
+    _tracer = provider.get_tracer("oracle_epm_support")
+    return provider
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from . import telemetry
+from .pdf_extraction import MAX_PDF_PAGES, process_pdf
+
+
+class UploadQueueFull(Exception):
+    """Raised when too many uploaded files are already waiting to be processed"""
+
+
+class UploadJobQueue:
+    """Background ingestion of uploaded PDFs.
+
+    PDF parsing and chunking are CPU-bound and run on a process pool. A single
+    storer thread in this process then hands each file's chunks to `store`,
+    which owns the database pool and in-memory indexes and returns the ids
+    of the chunks it stored. Jobs report per-file progress:
+    queued -> storing -> done | failed.
+    """
+
+    def __init__(self, store, workers=2, chunk_size=1500, overlap=200, max_pending=50, max_jobs=200,
+                 max_pages=MAX_PDF_PAGES, cache=None):
+        self.store = store
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.max_pages = max_pages
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._processes = ProcessPoolExecutor(max_workers=workers)
+        self._storer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload-store")
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, files):
+        """Queue (filename, spooled_path, content_hash) triples as one job and return its id"""
+        with self._lock:
+            if self._pending + len(files) > self.max_pending:
+                raise UploadQueueFull(f"{self._pending} files already queued")
+            self._pending += len(files)
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "running",
+                "created_at": time.time(),
+                "finished_at": None,
+                "files": [
+                    {"filename": filename, "status": "queued", "pages": 0, "chunks": 0, "error": None}
+                    for filename, _, _ in files
+                ],
+            }
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        for i, (filename, path, content_hash) in enumerate(files):
+            future = self._processes.submit(
+                process_pdf, path, self.chunk_size, self.overlap, self.max_pages, content_hash, self.cache
+            )
+            future.add_done_callback(partial(self._on_parsed, job_id, i, filename, path, content_hash))
+        return job_id
+
+    def _on_parsed(self, job_id, i, filename, path, content_hash, future):
+        # Runs on the process pool's management thread; keep it short
+        self._storer.submit(self._store_file, job_id, i, filename, path, content_hash, future)
+
+    def _store_file(self, job_id, i, filename, path, content_hash, future):
+        try:
+            result = future.result()
+            telemetry.observe("pdf_extraction", result["seconds"], detail="upload", pages=result["page_count"])
+            if result["cache_hit"] is not None:
+                telemetry.record_cache("pdf_text", result["cache_hit"])
+            self._update(job_id, i, status="storing", pages=result["page_count"])
+            with telemetry.span("pdf_store", chunks=len(result["chunks"])):
+                stored = self.store(filename, result["chunks"], result["page_count"], content_hash)
+            self._update(job_id, i, status="done", chunks=len(stored))
+            print(f"✅ Processed: {filename}")
+        except Exception as e:
+            self._update(job_id, i, status="failed", error=str(e))
+            print(f"❌ Error processing {filename}: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _update(self, job_id, i, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["files"][i].update(fields)
+            if all(f["status"] in ("done", "failed") for f in job["files"]):
+                job["status"] = "completed"
+                job["finished_at"] = time.time()
+
+    def get(self, job_id):
+        """Snapshot of a job's progress, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            files = [dict(f) for f in job["files"]]
+            return dict(
+                job,
+                files=files,
+                processed=sum(f["status"] == "done" for f in files),
+                failed=sum(f["status"] == "failed" for f in files),
+                chunks=sum(f["chunks"] for f in files),
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_files": self._pending,
+                "running_jobs": sum(j["status"] == "running" for j in self._jobs.values()),
+            }
@@ -0,0 +1,200 @@
+import threading
+import zlib
+
+import numpy as np
+
+from .search_index import tokenize
+
+
+def document_text(doc):
+    """Text embedded for a knowledge base document"""
+    keywords = doc.get("keywords") or []
+    if isinstance(keywords, (list, tuple)):
+        keywords = " ".join(keywords)
+    return f"{doc.get('title', '')}\n{keywords}\n{doc.get('content', '')}"
+
+
+class HashingEmbedder:
+    """Offline CPU embedder: hashed log-TF over unigrams and bigrams.
+
+    Tokens are hashed into `dim` buckets with crc32 (stable across processes,
+    so saved vectors stay valid). Document vectors are L2-normalised log-TF.
+    IDF is only applied on the query side, from document frequencies kept up
+    to date as documents are added, replaced and removed, so changing the
+    corpus never invalidates vectors that are already stored.
+    """
+
+    def __init__(self, dim=2048):
+        self.dim = dim
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.n_docs = 0
+        self._lock = threading.Lock()
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def _vector(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            vec[zlib.crc32(feature.encode("utf-8")) % self.dim] += 1.0
+        np.log1p(vec, out=vec)
+        return vec
+
+    def encode_documents(self, texts):
+        vectors = np.stack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        with self._lock:
+            self.doc_freq += (vectors > 0).sum(axis=0)
+            self.n_docs += len(texts)
+        return _normalize(vectors)
+
+    def forget_documents(self, texts):
+        """Take documents that were removed or replaced out of the document frequencies"""
+        if not texts:
+            return
+        present = (np.stack([self._vector(t) for t in texts]) > 0).sum(axis=0)
+        with self._lock:
+            np.maximum(self.doc_freq - present, 0, out=self.doc_freq)
+            self.n_docs = max(self.n_docs - len(texts), 0)
+
+    def encode_queries(self, texts):
+        vectors = np.stack([self._vector(t) for t in texts])
+        idf = np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1.0
+        return _normalize(vectors * idf)
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (name or path), used when installed"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode_documents(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    encode_queries = encode_documents
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def make_embedder(model_name=None, dim=2048):
+    """Sentence-transformers model if requested and available, hashed TF-IDF otherwise"""
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"Warning: embedding model '{model_name}' unavailable ({e}), using hashed TF-IDF")
+    return HashingEmbedder(dim)
+
+
+class VectorIndex:
+    """Dense vector index with exact top-k by batched matrix products.
+
+    Same add/remove/search interface as BM25Index. Unit-length vectors live in
+    one contiguous float32 matrix that grows by doubling, so a query is a
+    single matrix-vector product plus argpartition. For a few hundred thousand
+    vectors this is faster than an approximate index and needs no extra
+    dependency.
+    """
+
+    def __init__(self, embedder, capacity=1024, min_score=0.0):
+        self.embedder = embedder
+        self.min_score = min_score
+        self.matrix = np.zeros((capacity, embedder.dim), dtype=np.float32)
+        self.ids = []
+        self.rows = {}
+        self.docs = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _ensure_capacity(self, n):
+        if n > self.matrix.shape[0]:
+            grown = np.zeros((max(n, 2 * self.matrix.shape[0]), self.matrix.shape[1]), dtype=np.float32)
+            grown[:len(self.ids)] = self.matrix[:len(self.ids)]
+            self.matrix = grown
+
+    def add_many(self, items):
+        """Index (doc_id, doc, extra) triples with one batched embedding call"""
+        items = list(items)
+        if not items:
+            return
+        vectors = self.embedder.encode_documents([document_text(doc) for _, doc, _ in items])
+        with self._lock:
+            replaced = []
+            for (doc_id, doc, extra), vector in zip(items, vectors):
+                if doc_id in self.rows:
+                    row = self.rows[doc_id]
+                    replaced.append(self.docs[doc_id]["doc"])
+                else:
+                    row = len(self.ids)
+                    self._ensure_capacity(row + 1)
+                    self.ids.append(doc_id)
+                    self.rows[doc_id] = row
+                self.matrix[row] = vector
+                self.docs[doc_id] = dict(extra, doc=doc)
+            self._forget(replaced)
+
+    def _forget(self, docs):
+        # Replaced and removed documents no longer count towards the embedder's IDF
+        forget = getattr(self.embedder, "forget_documents", None)
+        if forget is not None and docs:
+            forget([document_text(doc) for doc in docs])
+
+    def add(self, doc_id, doc, **extra):
+        self.add_many([(doc_id, doc, extra)])
+
+    def remove(self, doc_id):
+        with self._lock:
+            row = self.rows.pop(doc_id, None)
+            if row is None:
+                return
+            # Move the last row into the hole to keep the matrix contiguous
+            last_id = self.ids.pop()
+            if last_id != doc_id:
+                self.matrix[row] = self.matrix[len(self.ids)]
+                self.ids[row] = last_id
+                self.rows[last_id] = row
+            self._forget([self.docs.pop(doc_id)["doc"]])
+
+    def search_batch(self, queries, k=3, predicate=None):
+        """Top-k results for several queries with one matrix product"""
+        with self._lock:
+            n = len(self.ids)
+            if not n:
+                return [[] for _ in queries]
+            scores = self.embedder.encode_queries(list(queries)) @ self.matrix[:n].T
+            results = []
+            for row_scores in scores:
+                # Over-fetch when filtering so k results usually survive the predicate;
+                # fall back to ranking every row if they don't
+                fetch = min(n, k if predicate is None else max(4 * k, 32))
+                hits = self._top_hits(row_scores, fetch, k, predicate)
+                if len(hits) < k and fetch < n and predicate is not None:
+                    hits = self._top_hits(row_scores, n, k, predicate)
+                results.append(hits)
+            return results
+
+    def _top_hits(self, row_scores, fetch, k, predicate):
+        top = np.argpartition(-row_scores, fetch - 1)[:fetch]
+        top = top[np.argsort(-row_scores[top])]
+        hits = []
+        for row in top:
+            if row_scores[row] <= self.min_score:
+                break
+            entry = self.docs[self.ids[row]]
+            if predicate is None or predicate(entry):
+                hits.append((float(row_scores[row]), self.ids[row], entry))
+                if len(hits) == k:
+                    break
+        return hits
+
+    def search(self, query, k=3, predicate=None):
+        return self.search_batch([query], k=k, predicate=predicate)[0]